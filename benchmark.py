@@ -0,0 +1,563 @@
+# Other imports
+import argparse
+import threading
+import time
+
+from PIL import Image
+
+# Class Imports
+from classes.framebuffer import FrameBuffer
+from classes.output import Output
+
+# Inky pHAT resolution and palette indexes
+WIDTH, HEIGHT = 250, 122
+WHITE, BLACK, RED = 0, 1, 2
+
+
+def time_cpu(function, repeats):
+    """
+    Runs the given function and returns the mean CPU time per call
+
+    Returns:
+        float: Mean CPU time in milliseconds
+    """
+    start = time.process_time()
+    for _ in range(repeats):
+        function()
+
+    return ((time.process_time() - start) / repeats) * 1000
+
+
+def report(name, before, after):
+    print(f"{name:<25} before: {before:8.2f}ms   after: {after:8.2f}ms   speed-up: {before / max(after, 1e-9):6.1f}x")
+
+
+# --- Raster --- #
+def putpixel_frame(img, progress=60, y_top=HEIGHT - 20):
+    """
+    The per pixel drawing the Display class used before the FrameBuffer
+    """
+    for x in range(WIDTH):
+        for y in range(HEIGHT):
+            img.putpixel((x, y), WHITE)
+
+    for x in range(WIDTH):
+        img.putpixel((x, 30), BLACK)
+        img.putpixel((x, 31), BLACK)
+
+    for h in range(WIDTH - 11):
+        img.putpixel((h + 6, y_top + 5), BLACK)
+        img.putpixel((h + 6, HEIGHT - 5), BLACK)
+
+    for v in range(HEIGHT - y_top - 10):
+        img.putpixel((6, y_top + v + 6), BLACK)
+        img.putpixel((WIDTH - 6, y_top + v + 6), BLACK)
+
+    for p in range(int((progress / 100) * (WIDTH - 12))):
+        for w in range(HEIGHT - y_top - 11):
+            img.putpixel((p + 7, y_top + w + 6), RED)
+
+
+def framebuffer_frame(img, framebuffer, progress=60, y_top=HEIGHT - 20):
+    """
+    The same frame drawn with the FrameBuffer primitives
+    """
+    framebuffer.clear(WHITE)
+    framebuffer.fill_rect(0, 30, WIDTH, 32, BLACK)
+
+    framebuffer.hline(6, WIDTH - 5, y_top + 5, BLACK)
+    framebuffer.hline(6, WIDTH - 5, HEIGHT - 5, BLACK)
+    framebuffer.vline(6, y_top + 6, HEIGHT - 4, BLACK)
+    framebuffer.vline(WIDTH - 6, y_top + 6, HEIGHT - 4, BLACK)
+    framebuffer.bar(7, y_top + 6, WIDTH - 5, HEIGHT - 5, progress, RED)
+
+    framebuffer.commit(img)
+
+
+def benchmark_raster(repeats):
+    before_img = Image.new("P", (WIDTH, HEIGHT))
+    after_img = Image.new("P", (WIDTH, HEIGHT))
+    framebuffer = FrameBuffer(WIDTH, HEIGHT)
+
+    before = time_cpu(lambda: putpixel_frame(before_img), repeats)
+    after = time_cpu(lambda: framebuffer_frame(after_img, framebuffer), repeats)
+
+    if (before_img.tobytes() != after_img.tobytes()):
+        print("WARNING: FrameBuffer output does not match the putpixel output!")
+
+    report("Frame (layout + bar)", before, after)
+
+
+# --- Render pipeline --- #
+SONGS = [("Bohemian Rhapsody", "Queen", False, True, 12),
+         ("HUMBLE.", "Kendrick Lamar", True, True, 48),
+         ("Everything In Its Right Place", "Radiohead", False, False, 0),
+         ("Midnight City", "M83", False, True, 97)]
+
+
+def benchmark_render(repeats, output_dir=None):
+    """
+    Runs the Display render pipeline against a virtual panel
+    """
+    from classes.display import Display
+    from classes.virtual_inky import VirtualInky
+
+    backend = VirtualInky(output_dir=output_dir)
+    display = Display(Output(isDebugging=False), backend=backend, startup_screen=False)
+
+    def render_songs():
+        for song in SONGS:
+            display.update_display_withSong(*song)
+
+    frame_time = time_cpu(render_songs, repeats) / len(SONGS)
+
+    print(f"{'Song frame':<25} {frame_time:8.2f}ms CPU per frame")
+    print(f"{'Refreshes':<25} {display.get_pushed_refreshes()} pushed, {display.get_skipped_refreshes()} skipped, {display.get_deferred_refreshes()} deferred")
+    print(f"{'Simulated refresh time':<25} {backend.get_simulated_latency():8.1f}s")
+
+
+# --- Album art --- #
+def floyd_steinberg(image, palette):
+    """
+    Pixel by pixel Floyd-Steinberg dither, used as the baseline for the vectorised dither
+    """
+    width, height = image.size
+    pixels = [[list(image.getpixel((x, y))) for x in range(width)] for y in range(height)]
+    indexes = bytearray(width * height)
+
+    for y in range(height):
+        for x in range(width):
+            old = [min(max(value, 0), 255) for value in pixels[y][x]]
+            index = min(range(len(palette)), key=lambda i: sum((old[c] - palette[i][c]) ** 2 for c in range(3)))
+            indexes[y * width + x] = index
+            error = [old[c] - palette[index][c] for c in range(3)]
+
+            for dx, dy, weight in ((1, 0, 7 / 16), (-1, 1, 3 / 16), (0, 1, 5 / 16), (1, 1, 1 / 16)):
+                if (0 <= x + dx < width and y + dy < height):
+                    for c in range(3):
+                        pixels[y + dy][x + dx][c] += error[c] * weight
+
+    return bytes(indexes)
+
+
+def benchmark_dither(repeats):
+    from classes.album_art import INKY_PALETTE, dither
+
+    # A colour gradient at the full panel size
+    gradient = Image.linear_gradient("L").resize((WIDTH, HEIGHT))
+    image = Image.merge("RGB", (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), gradient.rotate(180)))
+    palette = INKY_PALETTE.astype(int).tolist()
+
+    before = time_cpu(lambda: floyd_steinberg(image, palette), max(repeats // 10, 1))
+    after = time_cpu(lambda: dither(image), repeats)
+    quantize = time_cpu(lambda: image.quantize(palette=palette_image(palette)), repeats)
+
+    mismatched = sum(a != b for a, b in zip(floyd_steinberg(image, palette), dither(image)))
+
+    report(f"Dither {WIDTH}x{HEIGHT}", before, after)
+    print(f"{'Pixels differing':<25} {mismatched} / {WIDTH * HEIGHT} (float rounding)")
+    print(f"{'Pillow quantize (ref)':<25} {quantize:8.2f}ms")
+
+
+def palette_image(palette):
+    image = Image.new("P", (1, 1))
+    image.putpalette([value for colour in palette for value in colour] + [0] * (768 - len(palette) * 3))
+    return image
+
+
+# --- Poll scheduling --- #
+def listening_session(seed=1):
+    """
+    Builds a replayable listening session, a list of (start, end, status, song id, song duration) periods.
+    Some songs are skipped part way through, with a pause in the middle and a stop at the end.
+    """
+    import random
+    rng = random.Random(seed)
+
+    periods = []
+    t = 0.0
+    for song in range(40):
+        duration = rng.uniform(150, 300)
+        played = duration if rng.random() > 0.2 else rng.uniform(20, duration - 10)
+
+        if (song == 20):
+            # Pause half way through the song
+            periods.append((t, t + played / 2, "playing", song, duration, 0.0))
+            periods.append((t + played / 2, t + played / 2 + 300, "paused", song, duration, played / 2))
+            periods.append((t + played / 2 + 300, t + played + 300, "playing", song, duration, played / 2 - (t + played / 2 + 300)))
+            t += played + 300
+        else:
+            periods.append((t, t + played, "playing", song, duration, -t))
+            t += played
+
+    periods.append((t, t + 1800, "stopped", None, None, 0.0))
+    return periods
+
+
+def replay_session(periods, next_delay):
+    """
+    Polls the replayed session using next_delay to pick the wait between polls
+
+    Returns:
+        tuple: Song change detection latencies (seconds), number of API calls, session length (seconds)
+    """
+    end = periods[-1][1]
+    song_started = {}
+    for start, _, status, song, _, _ in periods:
+        if (status == "playing"):
+            song_started.setdefault(song, start)
+
+    latencies = []
+    seen_song = None
+    calls = 0
+    t = 0.0
+    state = {}
+
+    while (t < end):
+        start, _, status, song, duration, offset = next(period for period in periods if period[0] <= t < period[1])
+        calls += 1
+
+        # Paused periods store the frozen progress, playing periods the offset from the session clock
+        progress = offset if status == "paused" else (t + offset if status == "playing" else None)
+
+        if (status != "stopped" and song != seen_song):
+            latencies.append(t - song_started[song])
+            seen_song = song
+
+        t += max(next_delay(state, status, song, progress, duration), 0.1)
+
+    return latencies, calls, end
+
+
+def fixed_poll_delay(state, status, song, progress, duration):
+    """
+    The wait the Spotify loop used before the poll scheduler
+    """
+    if (status == "stopped"):
+        return 120
+
+    if (song != state.get("song")):
+        if (progress <= 5):
+            return 5 - progress
+
+        state["song"] = song
+        state["wait"] = -(-duration // 10)
+
+    return state["wait"]
+
+
+def scheduled_poll_delay(scheduler):
+    def next_delay(state, status, song, progress, duration):
+        if (status != "stopped" and song != state.get("song")):
+            if (progress <= 5):
+                return 5 - progress
+            state["song"] = song
+
+        return scheduler.next_delay(status, progress, duration)
+
+    return next_delay
+
+
+def benchmark_polling(repeats):
+    from classes.poll_scheduler import PollScheduler
+
+    periods = listening_session()
+
+    for name, next_delay in (("Fixed (duration / 10)", fixed_poll_delay),
+                             ("Poll scheduler", scheduled_poll_delay(PollScheduler()))):
+        latencies, calls, length = replay_session(periods, next_delay)
+        latencies.sort()
+
+        print(f"{name:<25} detection latency mean: {sum(latencies) / len(latencies):5.1f}s   "
+              f"p95: {latencies[int(len(latencies) * 0.95)]:5.1f}s   max: {latencies[-1]:5.1f}s   "
+              f"API calls/hour: {calls / (length / 3600):6.1f}")
+
+
+# --- Idle CPU --- #
+def counter_loops(stop, duration, counters, poll_interval=10):
+    """
+    The main loop, RefreshTimer thread and Spotify loop gate used before the deadline scheduler
+    """
+    timer = {"seconds_waited": 0}
+
+    def refresh_timer_loop():
+        while (not stop.is_set()):
+            timer["seconds_waited"] += 5
+            counters["wakeups"] += 1
+            time.sleep(5)
+
+    def spotify_loop():
+        while (not stop.is_set()):
+            while (timer["seconds_waited"] > 15 and not stop.is_set()):
+                counters["wakeups"] += 1
+                time.sleep(poll_interval)
+
+    for target in (refresh_timer_loop, spotify_loop):
+        threading.Thread(target=target, daemon=True).start()
+
+    end = time.monotonic() + duration
+    while (time.monotonic() < end):
+        counters["wakeups"] += 1
+        if (timer["seconds_waited"] >= 20):
+            timer["seconds_waited"] = 0
+        time.sleep(1)
+
+
+def scheduler_loops(stop, duration, counters, poll_interval=10):
+    """
+    The main loop blocking on the deadline scheduler, woken by the Spotify loop or the next refresh
+    """
+    from classes.deadline_scheduler import DeadlineScheduler
+    scheduler = DeadlineScheduler()
+
+    def spotify_loop():
+        while (not stop.wait(poll_interval)):
+            counters["wakeups"] += 1
+            scheduler.notify("spotify")
+
+    threading.Thread(target=spotify_loop, daemon=True).start()
+
+    scheduler.schedule("refresh", 120)
+    end = time.monotonic() + duration
+    while (time.monotonic() < end):
+        scheduler.wait(timeout=min(60, max(end - time.monotonic(), 0)))
+        counters["wakeups"] += 1
+        scheduler.schedule("refresh", 120)
+
+
+def benchmark_idle(seconds):
+    """
+    Runs each version of the loops for the given number of seconds with nothing changing,
+    reporting the CPU time used by the whole process and the number of thread wake-ups
+    """
+    for name, loops in (("Counters and 1s polling", counter_loops), ("Deadline scheduler", scheduler_loops)):
+        stop = threading.Event()
+        counters = {"wakeups": 0}
+
+        start_cpu = time.process_time()
+        loops(stop, seconds, counters)
+        cpu = time.process_time() - start_cpu
+        stop.set()
+
+        print(f"{name:<25} CPU: {cpu:7.3f}s ({cpu / seconds * 100:5.1f}% of a core)   "
+              f"wake-ups/min: {counters['wakeups'] / (seconds / 60):7.1f}")
+
+
+# --- Print progress interpolation --- #
+def simulated_print(seed=1, layers=200):
+    """
+    Builds a print where each layer takes a different time, like a real print slowing down on
+    larger layers, with OctoPrint's completion tracking the file position rather than the time.
+
+    Returns:
+        list: (end time, completion at the end) of each layer
+    """
+    import random
+    rng = random.Random(seed)
+
+    timeline = []
+    t = 0.0
+    for layer in range(layers):
+        t += rng.uniform(20, 60) * (1 + layer / layers)
+        timeline.append((t, (layer + 1) / layers * 100))
+
+    return timeline
+
+
+def sample_print(timeline, t, estimate_error):
+    """
+    Returns:
+        tuple: The true completion at time t and OctoPrint's estimate of the seconds left
+    """
+    previous_end, previous_completion = 0.0, 0.0
+    for end, completion in timeline:
+        if (t < end):
+            completion = previous_completion + (completion - previous_completion) * (t - previous_end) / (end - previous_end)
+            break
+        previous_end, previous_completion = end, completion
+
+    return completion, max(timeline[-1][0] - t, 0) * estimate_error
+
+
+def benchmark_interpolation(repeats):
+    """
+    Compares the progress shown between polls with and without interpolation against the true progress
+    """
+    from classes.octoprint import PrinterState
+
+    timeline = simulated_print()
+    length = timeline[-1][0]
+
+    for poll_interval in (10, 60, 300):
+        held_errors = []
+        interpolated_errors = []
+        state = None
+
+        for t in range(0, int(length)):
+            true_progress, time_left = sample_print(timeline, t, estimate_error=1.1)
+
+            if (t % poll_interval == 0):
+                state = PrinterState(True, true_progress, time_left, t)
+
+            held_errors.append(abs(state.progress - true_progress))
+            interpolated_errors.append(abs(state.get_progress(now=t) - true_progress))
+
+        print(f"Poll every {poll_interval:>3}s   held mean error: {sum(held_errors) / len(held_errors):5.2f}%   "
+              f"max: {max(held_errors):5.2f}%   interpolated mean error: {sum(interpolated_errors) / len(interpolated_errors):5.2f}%   "
+              f"max: {max(interpolated_errors):5.2f}%")
+
+
+# --- Printer offline --- #
+def blackhole_server():
+    """
+    A local port that never accepts, its backlog is filled so new connections hang like a powered off host
+
+    Returns:
+        tuple: The listening socket, the held connections and the port
+    """
+    import socket
+
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(0)
+    port = server.getsockname()[1]
+
+    held = []
+    for _ in range(3):
+        connection = socket.socket()
+        connection.setblocking(False)
+        try:
+            connection.connect(("127.0.0.1", port))
+        except BlockingIOError:
+            pass
+        held.append(connection)
+
+    time.sleep(0.1)
+    return server, held, port
+
+
+def benchmark_offline(repeats, cap=15):
+    """
+    Times the OctoPrint part of each main loop pass while the printer is offline
+    """
+    import requests
+    from classes.octoprint import OctoPrintAPI
+
+    server, held, port = blackhole_server()
+
+    # Before, a request with no timeout blocks until the OS gives up connecting
+    result = {}
+
+    def unbounded_request():
+        start = time.monotonic()
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/job")
+        except requests.RequestException:
+            pass
+        result["latency"] = time.monotonic() - start
+
+    thread = threading.Thread(target=unbounded_request, daemon=True)
+    thread.start()
+    thread.join(cap)
+    before = result.get("latency")
+
+    # After, bounded timeouts, then fast-fail until a probe succeeds
+    api = OctoPrintAPI("127.0.0.1", port, cache_ttl=0, probe_interval=1)
+    latencies = []
+    for _ in range(repeats):
+        start = time.monotonic()
+        api.get_snapshot()
+        latencies.append(time.monotonic() - start)
+        time.sleep(0.1)
+
+    server.close()
+    for connection in held:
+        connection.close()
+
+    before = f"{before:6.2f}s" if before is not None else f"  >{cap}s (still blocked)"
+    print(f"{'No timeout':<25} first pass: {before}")
+    print(f"{'Timeouts and fast-fail':<25} first pass: {latencies[0]:6.2f}s   mean: {sum(latencies) / len(latencies):6.3f}s   "
+          f"max: {max(latencies):6.2f}s   requests: {api.get_request_count()}   probes: {api.get_probe_count()}   "
+          f"fast-fails: {api.get_fast_fail_count()}")
+
+
+# --- Multiple printers --- #
+def benchmark_printers(repeats, delay=0.3):
+    """
+    Times polling 1 to 8 fake printers that each take delay seconds to answer, one after another
+    and concurrently through the printer registry. The registry is also timed with an offline printer added.
+    """
+    from classes.octoprint import OctoPrintAPI
+    from classes.printer_registry import PrinterRegistry, RegisteredPrinter
+    from fake_octoprint import FakeOctoPrint, FakeOctoPrintHandler
+
+    FakeOctoPrintHandler.log_message = lambda *args: None
+    output = Output(isDebugging=False)
+
+    servers = [FakeOctoPrint(("127.0.0.1", 0), delay=delay) for _ in range(8)]
+    ports = [server.start() for server in servers]
+    blackhole, held, blackhole_port = blackhole_server()
+
+    for count in (1, 2, 4, 8):
+        def make_printers():
+            return [RegisteredPrinter(f"Printer {i + 1}", OctoPrintAPI("127.0.0.1", port, cache_ttl=0))
+                    for i, port in enumerate(ports[:count])]
+
+        printers = make_printers()
+        start = time.monotonic()
+        for _ in range(repeats):
+            for printer in printers:
+                printer.api.get_snapshot()
+        sequential = (time.monotonic() - start) / repeats
+
+        registry = PrinterRegistry(output, make_printers())
+        start = time.monotonic()
+        for _ in range(repeats):
+            registry.poll()
+        concurrent = (time.monotonic() - start) / repeats
+        registry.shutdown()
+
+        offline = RegisteredPrinter("Offline", OctoPrintAPI("127.0.0.1", blackhole_port, cache_ttl=0))
+        registry = PrinterRegistry(output, make_printers() + [offline], poll_timeout=1)
+        start = time.monotonic()
+        for _ in range(repeats):
+            registry.poll()
+        with_offline = (time.monotonic() - start) / repeats
+        registry.shutdown()
+
+        print(f"{count} printers   sequential: {sequential:5.2f}s   registry: {concurrent:5.2f}s   "
+              f"registry with an offline printer: {with_offline:5.2f}s")
+
+    for server in servers:
+        server.stop()
+    blackhole.close()
+    for connection in held:
+        connection.close()
+
+
+BENCHMARKS = {
+    "raster": benchmark_raster,
+    "render": benchmark_render,
+    "dither": benchmark_dither,
+    "polling": benchmark_polling,
+    "idle": benchmark_idle,
+    "offline": benchmark_offline,
+    "interpolation": benchmark_interpolation,
+    "printers": benchmark_printers,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run ({', '.join(BENCHMARKS)}), all of them if none are given")
+    parser.add_argument("-n", type=int, default=20, required=False, help="Number of repeats")
+
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        if (name not in BENCHMARKS):
+            parser.error(f"unknown benchmark '{name}'")
+
+    for name in (args.benchmarks or BENCHMARKS):
+        print(f"--- {name} ---")
+        BENCHMARKS[name](args.n)
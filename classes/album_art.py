@@ -0,0 +1,212 @@
+import io
+import os
+import threading
+import zlib
+
+import numpy
+import requests
+from PIL import Image
+
+
+# RGB values of the Inky palette, in palette index order (WHITE, BLACK, RED)
+INKY_PALETTE = numpy.array([[255, 255, 255],
+                            [0, 0, 0],
+                            [255, 0, 0]], dtype=numpy.float32)
+
+
+def dither(image, palette=INKY_PALETTE):
+    """
+    Reduces an image to the given palette using Floyd-Steinberg error diffusion.
+
+    A pixel only depends on pixels to its left and in the row above, so every pixel on the
+    wavefront x + 2y = t can be quantised at the same time. Each wavefront is processed in one
+    vectorised step, so the only Python loop is over the (width + 2 * height) wavefronts.
+
+    Args:
+        image (Image): The image to dither, already at the target size
+        palette (numpy.ndarray): RGB values of each palette index
+
+    Returns:
+        bytes: One palette index per pixel, row by row
+    """
+
+    pixels = numpy.asarray(image.convert("RGB"), dtype=numpy.float32)
+    height, width, _ = pixels.shape
+
+    # Padded by one column on each side and one row below so the error never needs bounds checks
+    buffer = numpy.zeros((height + 1, width + 2, 3), dtype=numpy.float32)
+    buffer[:height, 1:width + 1] = pixels
+    indexes = numpy.empty((height, width), dtype=numpy.uint8)
+
+    rows = numpy.arange(height)
+
+    for t in range(width + 2 * (height - 1)):
+        columns = t - 2 * rows
+        on_wavefront = (columns >= 0) & (columns < width)
+        ys, xs = rows[on_wavefront], columns[on_wavefront] + 1
+
+        values = numpy.clip(buffer[ys, xs], 0, 255)
+
+        # Nearest palette colour for every pixel on the wavefront
+        distances = ((values[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
+        nearest = distances.argmin(axis=1)
+        indexes[ys, xs - 1] = nearest
+
+        error = values - palette[nearest]
+
+        # Each statement has unique targets, so no error is lost when wavefront pixels share a neighbour
+        buffer[ys, xs + 1] += error * (7 / 16)
+        buffer[ys + 1, xs - 1] += error * (3 / 16)
+        buffer[ys + 1, xs] += error * (5 / 16)
+        buffer[ys + 1, xs + 1] += error * (1 / 16)
+
+    return indexes.tobytes()
+
+
+class HTTPAlbumArtSource:
+    """
+    Fetches album art over HTTP.
+
+    By default the image URL from Spotify is used, if base_url is given the art is fetched from
+    '{base_url}/{album_id}' instead, E.g. a local stand-in server.
+    """
+
+    def __init__(self, base_url=None, timeout=(3, 10)):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        self.requests = 0
+
+    def fetch(self, album_id, url):
+        """
+        Returns:
+            bytes: The encoded image
+        """
+        if (self.base_url is not None):
+            url = f"{self.base_url.rstrip('/')}/{album_id}"
+
+        self.requests += 1
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+
+        return response.content
+
+
+class AlbumArtCache:
+    """
+    On-disk cache of dithered album art keyed by album id.
+    When the cache grows past max_bytes the least recently used files are removed.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_path(self, album_id, size):
+        return os.path.join(self.cache_dir, f"{album_id}_{size[0]}x{size[1]}.pal")
+
+    def get(self, album_id, size):
+        """
+        Returns:
+            bytes: The cached palette bytes, or None if the album isn't cached
+        """
+        path = self.get_path(album_id, size)
+
+        with self.lock:
+            try:
+                with open(path, "rb") as cache_file:
+                    data = zlib.decompress(cache_file.read())
+            except (OSError, zlib.error):
+                self.misses += 1
+                return None
+
+            # Mark as recently used
+            os.utime(path)
+            self.hits += 1
+
+        return data
+
+    def put(self, album_id, size, data):
+        path = self.get_path(album_id, size)
+
+        with self.lock:
+            with open(path + ".tmp", "wb") as cache_file:
+                cache_file.write(zlib.compress(data))
+            os.replace(path + ".tmp", path)
+
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used files until the cache is under max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if (name.endswith(".pal")):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, name in sorted(entries):
+            if (total <= self.max_bytes):
+                break
+
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def get_size(self):
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                   for name in os.listdir(self.cache_dir) if name.endswith(".pal"))
+
+
+class AlbumArt:
+    """
+    Fetches, resizes and dithers album art for the display, going through the on-disk cache first
+    so a repeat track or album is never downloaded or dithered twice.
+    """
+
+    def __init__(self, output, source, cache, size=(70, 70)):
+        self.output = output
+        self.source = source
+        self.cache = cache
+        self.size = tuple(size)
+
+    def get(self, album_id, url):
+        """
+        Args:
+            album_id (String): Spotify album id
+            url (String): URL of the album image
+
+        Returns:
+            bytes: Palette bytes of the art at self.size, or None if it couldn't be fetched
+        """
+        if (not album_id):
+            return None
+
+        data = self.cache.get(album_id, self.size)
+        if (data is not None):
+            return data
+
+        try:
+            self.output.debug("Fetching album art for '%s'", "Album Art", album_id)
+            image = Image.open(io.BytesIO(self.source.fetch(album_id, url)))
+            image = image.convert("RGB").resize(self.size, Image.LANCZOS)
+        except Exception as Ex:
+            self.output.out(f"Unable to fetch album art!\n{Ex}", "Album Art", status="warning")
+            return None
+
+        data = dither(image)
+        self.cache.put(album_id, self.size, data)
+
+        return data
+
+    def get_size(self):
+        return self.size
@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """
+    Wakes a single waiting thread when a named timer is due or another thread signals an event.
+
+    Timers are kept in a heap ordered by their monotonic deadline. Rescheduling a timer leaves its
+    old entry in the heap, it is skipped when it reaches the top, so scheduling never searches the heap.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.timers = []                # Heap of (deadline, sequence, name)
+        self.deadlines = {}             # Deadline of each timer's live heap entry
+        self.events = set()
+        self.sequence = itertools.count()
+
+        self.wakeups = 0
+
+    def schedule(self, name, delay):
+        """
+        Sets the timer to fire after delay seconds, replacing any earlier deadline it had
+
+        Args:
+            name (String): Name of the timer
+            delay (float): Seconds from now
+        """
+        deadline = time.monotonic() + max(delay, 0)
+
+        with self.condition:
+            self.deadlines[name] = deadline
+            heapq.heappush(self.timers, (deadline, next(self.sequence), name))
+            self.condition.notify()
+
+    def cancel(self, name):
+        with self.condition:
+            self.deadlines.pop(name, None)
+
+    def notify(self, name):
+        """
+        Signals an event, waking the waiting thread straight away. Can be called from any thread
+        """
+        with self.condition:
+            self.events.add(name)
+            self.condition.notify()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until a timer is due, an event is signalled or the timeout is reached
+
+        Args:
+            timeout (float): Longest time to block for, E.g. to check in with the watchdog
+
+        Returns:
+            set: Names of the due timers and signalled events, empty if the timeout was reached
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            while (True):
+                fired = self.pop_due()
+                if (fired or self.events):
+                    break
+
+                now = time.monotonic()
+                deadlines = [deadline for deadline in (self.get_next_deadline(), end) if deadline is not None]
+
+                if (deadlines and min(deadlines) <= now):
+                    break
+
+                self.condition.wait(min(deadlines) - now if deadlines else None)
+
+            fired |= self.events
+            self.events = set()
+            self.wakeups += 1
+
+        return fired
+
+    def pop_due(self):
+        """
+        Removes the timers that are due from the heap, the caller must hold the condition
+
+        Returns:
+            set: Names of the due timers
+        """
+        now = time.monotonic()
+        fired = set()
+
+        while (self.timers and self.timers[0][0] <= now):
+            deadline, _, name = heapq.heappop(self.timers)
+
+            # Skip entries left behind by rescheduling or cancelling
+            if (self.deadlines.get(name) == deadline):
+                del self.deadlines[name]
+                fired.add(name)
+
+        return fired
+
+    def get_next_deadline(self):
+        """
+        Returns:
+            float: The monotonic time of the next live timer, None if there are no timers
+        """
+        with self.condition:
+            while (self.timers and self.deadlines.get(self.timers[0][2]) != self.timers[0][0]):
+                heapq.heappop(self.timers)
+
+            return self.timers[0][0] if self.timers else None
+
+    def get_wakeups(self) -> int:
+        return self.wakeups
@@ -1,34 +1,86 @@
 import datetime
+import hashlib
+import os
 import sys
 import time
+import zlib
 
 # Display Imports
-from inky.auto import auto
 from PIL import Image, ImageFont, ImageDraw
 from font_hanken_grotesk import HankenGroteskBold, HankenGroteskMedium
 from font_intuitive import Intuitive
 
+from classes.framebuffer import FrameBuffer
+from classes.layer_cache import LayerCache
+from classes.refresh_policy import RefreshPolicy
+from classes.request_guard import LatencyHistogram
+from classes.stage_timer import StageTimer
+from classes.text_metrics import TextMetrics
+
 
 class Display:
-    def __init__(self, output):
+    # Refresh latency histogram buckets (in seconds)
+    REFRESH_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+    def __init__(self, output, text_metrics=None, backend=None, startup_screen=True, album_art=None, stage_timer=None,
+                 minor_interval=90):
+        """
+        Args:
+            output (Output): Output class used for logging
+            text_metrics (TextMetrics): Shared text size cache, a new one is made if not given
+            backend (object): Display to draw to (E.g. a VirtualInky), the attached Inky board is used if not given
+            startup_screen (Boolean): Clean the display and show the splash screen on initialisation
+            album_art (AlbumArt): Album art pipeline, album art isn't shown if not given
+            stage_timer (StageTimer): Times each stage of a display update, a new one is made if not given
+            minor_interval (float): Seconds the clock and progress bar only changes are held back for
+        """
         self.output = output
+        self.album_art = album_art
+        
+        # Shared cache of text sizes
+        self.text_metrics = text_metrics if text_metrics is not None else TextMetrics()
+        self.stage_timer = stage_timer if stage_timer is not None else StageTimer()
 
         # Display Values
-        try:
-            self.output.out("Initialising inky_display...", f"{__class__.__name__}")
-            self.inky_display = auto(ask_user=True, verbose=True)
-        except TypeError:
-            self.output.out("Failed to initialise inky_display", f"{__class__.__name__}", "error")
-            raise TypeError("You need to update the Inky Library to >= v1.1.0")
-        
+        if (backend is not None):
+            self.inky_display = backend
+            self.output.out(f"Using {type(backend).__name__} display backend", f"{__class__.__name__}")
         else:
-            self.output.out("Successfully Initialised inky_display", f"{__class__.__name__}", "success")
+            self.inky_display = self.init_inky()
         
         self.img = Image.new("P", self.inky_display.resolution)
         self.draw = ImageDraw.Draw(self.img)
         
+        # Palette buffer used for all the shape drawing
+        self.framebuffer = FrameBuffer(self.inky_display.WIDTH, self.inky_display.HEIGHT, self.inky_display.WHITE)
+        
+        # Digest of the last frame pushed to the display and the refresh counters
+        self.last_frame_digest = None
+        self.pushed_refreshes = 0
+        self.skipped_refreshes = 0
+        
+        # Layout regions of the current frame, the digests of the regions last pushed and the refresh policy
+        self.regions = {}
+        self.region_digests = {}
+        self.refresh_policy = RefreshPolicy(minor_interval=minor_interval)
+        self.supports_partial = callable(getattr(self.inky_display, "show_partial", None))
+        self.partial_refreshes = 0
+        self.deferred_refreshes = 0
+        # Time taken by each full and partial refresh of the panel, an e-ink refresh takes seconds
+        self.refresh_latency = {RefreshPolicy.FULL: LatencyHistogram(self.REFRESH_BUCKETS),
+                                RefreshPolicy.PARTIAL: LatencyHistogram(self.REFRESH_BUCKETS)}
+        
+        # Build the static layers (separator line, progress bar outline and notches) once
+        self.colour_mode = "light"
+        self.bar_top = self.inky_display.HEIGHT - 20
+        self.layer_cache = LayerCache(self.inky_display.resolution, self.colour_mode)
+        self.build_layers()
+        
+        # Pre-rendered top artist frames keyed by (position, artist name)
+        self.carousel_frames = {}
+        
         # Path to splash screen image
-        self.splash_screen_path = "/home/georgepearson/Display/images/spotipi-logo.png"
+        self.splash_screen_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images", "spotipi-logo.png")
 
         # Fonts
         self.INTUITIVE_FONT = ImageFont.truetype(Intuitive, 20)
@@ -42,62 +94,106 @@ class Display:
         self.TOP_ARTIST_FONT = ImageFont.truetype(HankenGroteskBold, 30)
         
         # Clean the display and show the splash screen once the class is initialised
+        if (startup_screen):
+            self.show_startup_screen()
+
+    def show_startup_screen(self):
+        """
+        Cleans the display and shows the splash screen
+        """
         self.output.out("Cleaning display and showing splash-screen", f"{__class__.__name__}")
         self.clean_display(cycles=1)
         time.sleep(2)
         self.splash_screen()
 
+    def init_inky(self):
+        """
+        Detects and initialises the attached Inky board
+
+        Returns:
+            Inky: The Inky display object
+        """
+        
+        from inky.auto import auto
+        
+        try:
+            self.output.out("Initialising inky_display...", f"{__class__.__name__}")
+            # Never prompt on stdin, SpotiPi normally runs as a service
+            inky_display = auto(ask_user=False, verbose=True)
+        except TypeError:
+            self.output.out("Failed to initialise inky_display", f"{__class__.__name__}", status="error")
+            raise TypeError("You need to update the Inky Library to >= v1.1.0")
+        
+        else:
+            self.output.out("Successfully Initialised inky_display", f"{__class__.__name__}", status="success")
+        
+        return inky_display
+
 
     def update_display_withSong(self,
                                 song_name,
                                 artist_name,
                                 isExplicit,
                                 isPrinting,
-                                print_progress
+                                print_progress,
+                                album_id=None,
+                                album_art_url=None
                                 ):
         
         """
         Takes the song info and draws it to the display.
         If there is something printing this will also be drawn.
+        If album art is enabled the art for album_id is drawn on the right hand side.
         """
         
-        date_w, date_h, time_w, time_h, date_x, time_x = self.draw_date_time()
+        with self.stage_timer.span("display.draw_date_time"):
+            date_w, date_h, time_w, time_h, date_x, time_x = self.draw_date_time()
         
-        # Gets the W/H and sets the X/Y
-        song_name_w, song_name_h = self.SONG_FONT.getsize(song_name)
-        artist_name_w, artist_name_h = self.ARTIST_FONT.getsize(artist_name)
+        with self.stage_timer.span("display.text_layout"):
+            # Gets the W/H and sets the X/Y
+            song_name_w, song_name_h = self.text_metrics.getsize(self.SONG_FONT, song_name)
+            artist_name_w, artist_name_h = self.text_metrics.getsize(self.ARTIST_FONT, artist_name)
 
-        # Sets song_name_y
-        song_name_y = time_h + 15
-        
-        # Adds explicit tag and sets song_name_x
-        if (isExplicit):
-            self.draw.text((5, song_name_y), "E", self.inky_display.RED, font=self.EXPLICIT_FONT)
+            # Sets song_name_y
+            song_name_y = time_h + 15
+            
+            # Adds explicit tag and sets song_name_x
+            if (isExplicit):
+                self.draw.text((5, song_name_y), "E", self.inky_display.RED, font=self.EXPLICIT_FONT)
 
-            explicit_w, explicit_h = self.EXPLICIT_FONT.getsize("E")
+                explicit_w, explicit_h = self.text_metrics.getsize(self.EXPLICIT_FONT, "E")
 
-            song_name_x = explicit_w + 10
-            song_name_w = song_name_w + song_name_x
+                song_name_x = explicit_w + 10
+                song_name_w = song_name_w + song_name_x
 
-        else:
-            song_name_x = 5
+            else:
+                song_name_x = 5
 
-        # Sets artist x/y
-        artist_name_x = 5
-        artist_name_y = song_name_y + song_name_h
+            # Sets artist x/y
+            artist_name_x = 5
+            artist_name_y = song_name_y + song_name_h
 
-        # Draw spotify data
-        self.draw.text((song_name_x, song_name_y), song_name, self.inky_display.BLACK, font=self.SONG_FONT)
-        self.draw.text((artist_name_x, artist_name_y), artist_name, self.inky_display.BLACK, font=self.ARTIST_FONT)
+            # Draw spotify data
+            self.draw.text((song_name_x, song_name_y), song_name, self.inky_display.BLACK, font=self.SONG_FONT)
+            self.draw.text((artist_name_x, artist_name_y), artist_name, self.inky_display.BLACK, font=self.ARTIST_FONT)
 
-        # If OctoPrint is running draw its progress
-        if (isPrinting):
-            self.create_progressBar(print_progress, artist_name_y + artist_name_h)
-            
-        self.create_progressBar(60, artist_name_y + artist_name_h)
+        # Layout regions used to work out what has changed since the last frame
+        self.regions = {"clock": (0, 0, self.inky_display.WIDTH, 32),
+                        "title": (0, 32, self.inky_display.WIDTH, artist_name_y),
+                        "artist": (0, artist_name_y, self.inky_display.WIDTH, artist_name_y + artist_name_h),
+                        "bar": (0, artist_name_y + artist_name_h, self.inky_display.WIDTH, self.inky_display.HEIGHT)}
 
-        self.inky_display.set_image(self.img)
-        self.inky_display.show()
+        # Draw the album art on the right, between the date/time and the progress bar
+        if (self.album_art is not None and album_id):
+            with self.stage_timer.span("display.album_art"):
+                self.draw_album_art(album_id, album_art_url)
+
+        with self.stage_timer.span("display.progress_bar"):
+            # If OctoPrint is running draw its progress
+            if (isPrinting):
+                self.create_progressBar(print_progress, artist_name_y + artist_name_h)
+
+        self.push_frame()
 
     def update_display_topArtist(self, artist_position, artist_name, isPrinting, print_progress):
         """
@@ -110,18 +206,179 @@ class Display:
             print_progress (int): _description_
         """
         
-        date_w, date_h, time_w, time_h, date_x, time_x = self.draw_date_time()
+        carousel_frame = self.carousel_frames.get((artist_position, artist_name))
         
-        artist_name_y = time_h + 20
+        if (carousel_frame is not None):
+            # Only the clock needs drawing on top of the pre-rendered frame
+            cached_time_h, compressed_frame = carousel_frame
+            date_w, date_h, time_w, time_h, date_x, time_x = self.draw_date_time(base_frame=zlib.decompress(compressed_frame))
+            
+            # The artist was placed using the clock height when it was rendered
+            if (time_h != cached_time_h):
+                carousel_frame = None
+        
+        if (carousel_frame is None):
+            with self.stage_timer.span("display.draw_date_time"):
+                date_w, date_h, time_w, time_h, date_x, time_x = self.draw_date_time()
+            
+            with self.stage_timer.span("display.text_layout"):
+                self.draw_top_artist(self.draw, artist_position, artist_name, time_h)
         
-        self.draw.text((5, artist_name_y), (f"{artist_position}. {artist_name}"), self.inky_display.BLACK, font=self.TOP_ARTIST_FONT)
+        self.regions = {"clock": (0, 0, self.inky_display.WIDTH, 32),
+                        "title": (0, 32, self.inky_display.WIDTH, self.inky_display.HEIGHT - 20),
+                        "bar": (0, self.inky_display.HEIGHT - 20, self.inky_display.WIDTH, self.inky_display.HEIGHT)}
         
         # If OctoPrint is running draw its progress
         if (isPrinting):
-            self.create_progressBar(print_progress, self.inky_display.HEIGHT - 20)
+            with self.stage_timer.span("display.progress_bar"):
+                self.create_progressBar(print_progress, self.inky_display.HEIGHT - 20)
 
-        self.inky_display.set_image(self.img)
-        self.inky_display.show()
+        self.push_frame()
+
+    def draw_album_art(self, album_id, album_art_url):
+        """
+        Gets the dithered album art from the album art pipeline and draws it to the image
+        """
+        art = self.album_art.get(album_id, album_art_url)
+        if (art is None):
+            return
+        
+        art_w, art_h = self.album_art.get_size()
+        art_x, art_y = self.inky_display.WIDTH - art_w - 5, 34
+        
+        self.framebuffer.load(self.get_img())
+        self.framebuffer.blit(art, art_x, art_y, art_w, art_h)
+        self.framebuffer.commit(self.get_img())
+        
+        self.regions["art"] = (art_x, art_y, art_x + art_w, art_y + art_h)
+
+    def get_text_width(self):
+        """
+        Returns:
+            int: The maximum width of the song and artist text, leaving room for the album art if it's shown
+        """
+        if (self.album_art is not None):
+            return self.inky_display.WIDTH - self.album_art.get_size()[0] - 10
+        
+        return self.inky_display.WIDTH - 5
+
+    def draw_top_artist(self, draw, artist_position, artist_name, time_h):
+        """
+        Draws the top artist's position and name underneath the date and time
+        """
+        artist_name_y = time_h + 20
+        
+        draw.text((5, artist_name_y), (f"{artist_position}. {artist_name}"), self.inky_display.BLACK, font=self.TOP_ARTIST_FONT)
+
+    def prerender_top_artists(self, top_artists):
+        """
+        Renders a frame for each of the top artists, without the date and time, so showing
+        an artist only needs the clock drawing on top.
+        Frames are stored zlib compressed as they are mostly background.
+
+        Args:
+            top_artists (list): The users top artists, in order
+        """
+        
+        _, local_time = self.get_date_time()
+        _, time_h = self.text_metrics.getsize(self.HANKEN_BOLD_FONT, local_time)
+        
+        base = self.layer_cache.get("base", self.build_base_layer)
+        carousel_img = Image.new("P", self.inky_display.resolution)
+        carousel_draw = ImageDraw.Draw(carousel_img)
+        
+        carousel_frames = {}
+        for position, artist_name in enumerate(top_artists, start=1):
+            carousel_img.frombytes(base)
+            self.draw_top_artist(carousel_draw, position, artist_name, time_h)
+            
+            carousel_frames[(position, artist_name)] = (time_h, zlib.compress(carousel_img.tobytes()))
+        
+        # Swapped in as a whole so the display worker never sees a half built carousel
+        self.carousel_frames = carousel_frames
+        
+        self.output.debug("Pre-rendered %d top artist frames (%d bytes)", "Display",
+                          len(carousel_frames), sum(len(frame) for _, frame in carousel_frames.values()))
+
+    def push_frame(self):
+        """
+        Pushes the composed image to the display, unless it is identical to the last frame pushed.
+        The regions that have changed are passed to the refresh policy, which decides if the
+        display gets a full refresh, a partial refresh of only those regions, or none at all.
+
+        Returns:
+            Boolean: True if the display was refreshed, False if the refresh was skipped
+        """
+        
+        frame_digest = hashlib.blake2b(self.img.tobytes(), digest_size=16).digest()
+        
+        if (frame_digest == self.last_frame_digest):
+            self.skipped_refreshes += 1
+            self.output.debug("Frame unchanged, skipping refresh (%d skipped)", "Display", self.skipped_refreshes)
+            return False
+        
+        region_digests = self.get_region_digests()
+        dirty_regions = self.get_dirty_regions(region_digests)
+        
+        mode = self.refresh_policy.decide(dirty_regions, self.supports_partial)
+        self.output.debug("Changed regions: %s, refresh: %s", "Display", sorted(dirty_regions), mode)
+        
+        if (mode == RefreshPolicy.SKIP):
+            self.deferred_refreshes += 1
+            return False
+        
+        refresh_start = time.monotonic()
+        
+        with self.stage_timer.span("display.set_image"):
+            self.inky_display.set_image(self.img)
+        
+        if (mode == RefreshPolicy.PARTIAL):
+            with self.stage_timer.span("display.show_partial"):
+                self.inky_display.show_partial([self.regions[name] for name in sorted(dirty_regions)])
+            self.partial_refreshes += 1
+        else:
+            with self.stage_timer.span("display.show"):
+                self.inky_display.show()
+        
+        self.refresh_latency[mode].observe(time.monotonic() - refresh_start)
+        self.refresh_policy.refreshed(mode, started_at=refresh_start)
+        self.region_digests = region_digests
+        self.last_frame_digest = frame_digest
+        self.pushed_refreshes += 1
+        return True
+
+    def get_region_digests(self):
+        """
+        Hashes each layout region of the current image
+
+        Returns:
+            dict: The region name mapped to its box and the digest of its pixels
+        """
+        
+        return {name: (box, hashlib.blake2b(self.img.crop(box).tobytes(), digest_size=16).digest())
+                for name, box in self.regions.items()}
+
+    def get_dirty_regions(self, region_digests):
+        """
+        Compares the given region digests against the ones last pushed to the display
+
+        Returns:
+            set: The names of the regions that have changed
+        """
+        
+        # A different layout (or the first frame) means everything has changed
+        if (region_digests.keys() != self.region_digests.keys()):
+            return set(region_digests)
+        
+        return {name for name, digest in region_digests.items() if digest != self.region_digests[name]}
+
+    def invalidate_frame(self):
+        """
+        Forgets the last frame pushed, used when something else has been drawn to the panel
+        """
+        self.last_frame_digest = None
+        self.region_digests = {}
+        self.refresh_policy.reset()
 
     # Display Getters and setters
     # --- FONT --- #
@@ -134,6 +391,13 @@ class Display:
     def get_EXPLICIT_FONT(self):
         return self.EXPLICIT_FONT
 
+    # --- Text Metrics --- #
+    def get_text_metrics(self):
+        return self.text_metrics
+
+    def get_stage_timer(self):
+        return self.stage_timer
+
     # --- Image --- #
     def set_img(self, img):
         self.img = img
@@ -144,6 +408,22 @@ class Display:
     def get_inky_display(self):
         return self.inky_display
 
+    # --- Refresh Counters --- #
+    def get_pushed_refreshes(self):
+        return self.pushed_refreshes
+
+    def get_skipped_refreshes(self):
+        return self.skipped_refreshes
+
+    def get_partial_refreshes(self):
+        return self.partial_refreshes
+
+    def get_refresh_latency(self):
+        return self.refresh_latency
+
+    def get_deferred_refreshes(self):
+        return self.deferred_refreshes
+
     # --- Draw --- #
     def set_draw(self, draw):
         self.draw = draw
@@ -173,7 +453,7 @@ class Display:
             return given_y
 
     def get_layout_colour(self, area):
-        mode = "light"
+        mode = self.colour_mode
 
         if area == "background":
             if mode == "light":
@@ -199,19 +479,20 @@ class Display:
         colour_names = ("red", "black", "white")
 
         clean_img = Image.new("P", self.inky_display.resolution)
+        clean_buffer = FrameBuffer(self.inky_display.WIDTH, self.inky_display.HEIGHT)
 
         for i in range(cycles):
             self.output.out(f"Cleaning cycle {i+1}/{cycles}", "Display")
             for j, c in enumerate(colours):
                 self.output.debug("updating with %s" % colour_names[j], "Display")
                 self.inky_display.set_border(c)
-                for x in range(self.inky_display.WIDTH):
-                    for y in range(self.inky_display.HEIGHT):
-                        clean_img.putpixel((x, y), c)
-                self.inky_display.set_image(clean_img)
+                clean_buffer.clear(c)
+                self.inky_display.set_image(clean_buffer.commit(clean_img))
                 self.inky_display.show()
                 time.sleep(1)
 
+        # The panel no longer shows the last frame
+        self.invalidate_frame()
         self.output.debug("Cleaning complete!", "Display")
 
     def splash_screen(self):
@@ -221,6 +502,7 @@ class Display:
         splash_img = Image.open(self.splash_screen_path)
         self.inky_display.set_image(splash_img)
         self.inky_display.show()
+        self.invalidate_frame()
 
         time.sleep(15)
 
@@ -231,27 +513,21 @@ class Display:
         Returns:
             Image: An Image object.
         """
-        area_img = self.img
-        for x in range(self.inky_display.width):
-            for y in range(self.inky_display.height):
-                area_img.putpixel((x, y), self.inky_display.WHITE)
+        self.framebuffer.clear(self.inky_display.WHITE)
 
-        return area_img
+        return self.framebuffer.commit(self.img)
 
     def create_layout(self):
         """
-        Draws a line underneath the date and time.
+        Starts a new frame from the cached base layer, a blank background with a line underneath the date and time.
 
         Returns:
             Image: An Image object.
         """
         
-        layout_img = self.get_img()
-        for x in range(self.inky_display.WIDTH):
-            layout_img.putpixel((x, 30), self.get_layout_colour("border"))
-            layout_img.putpixel((x, 31), self.get_layout_colour("border"))
+        self.framebuffer.buffer[:] = self.layer_cache.get("base", self.build_base_layer)
 
-        return layout_img
+        return self.framebuffer.commit(self.get_img())
 
     def create_progressBar(self, progress, y_top):
         """
@@ -262,47 +538,102 @@ class Display:
             y_top (int): y axis value of the lowest item on the screen.
         """
         x_padding = 6
-        print(f"self.inky_display.HEIGHT = {self.inky_display.HEIGHT}")
-        print(f"y_top = {y_top}")
+        self.output.debug("self.inky_display.HEIGHT = %d", "Display", self.inky_display.HEIGHT)
+        self.output.debug("y_top = %s", "Display", y_top)
         
         if ((self.inky_display.HEIGHT - y_top + 5) < (self.inky_display.HEIGHT - 20)):
             y_top = self.inky_display.HEIGHT - 20
         
-        progressBar_img = self.get_img()
+        # Load the current image so any text already drawn is kept
+        self.framebuffer.load(self.get_img())
+        
+        if (y_top == self.bar_top):
+            # Composite the cached outline, then the filled part of the cached full bar on top
+            self.framebuffer.copy_rect(self.layer_cache.get("bar", self.build_bar_layer),
+                                       x_padding, y_top + 5, self.inky_display.WIDTH, self.inky_display.HEIGHT - 4)
+            
+            fill_w = int((progress/100) * (self.inky_display.WIDTH - 12))
+            self.framebuffer.copy_rect(self.layer_cache.get("bar_full", lambda: self.build_bar_layer(100)),
+                                       x_padding + 1, y_top + 6, x_padding + 1 + fill_w, self.inky_display.HEIGHT - 5)
+        
+        else:
+            self.draw_progressBar(self.framebuffer, progress, y_top)
+
+        self.framebuffer.commit(self.get_img())
+
+    def draw_progressBar(self, framebuffer, progress, y_top):
+        """
+        Draws the progress bar outline, fill and notches into the given framebuffer
+
+        Args:
+            framebuffer (FrameBuffer): The buffer to draw into.
+            progress (int): Progress of the current print.
+            y_top (int): y axis value of the top of the progress bar area.
+        """
+        x_padding = 6
+        border = self.get_layout_colour("border")
         
-        # Create top bars
-        for h in range(self.inky_display.WIDTH - 11):
-            progressBar_img.putpixel((h + x_padding, y_top + 5), self.get_layout_colour("border"))    # Top
-            progressBar_img.putpixel((h + x_padding, self.inky_display.HEIGHT - 5), self.get_layout_colour("border"))    # Bottom
+        # Create top and bottom bars
+        framebuffer.hline(x_padding, self.inky_display.WIDTH - 5, y_top + 5, border)                        # Top
+        framebuffer.hline(x_padding, self.inky_display.WIDTH - 5, self.inky_display.HEIGHT - 5, border)     # Bottom
 
         # Create side bars
-        for v in range(self.inky_display.HEIGHT - y_top - 10):
-            progressBar_img.putpixel((x_padding, y_top + v + 6), self.get_layout_colour("border"))                              # Left
-            progressBar_img.putpixel((self.inky_display.WIDTH - x_padding, y_top + v + 6), self.get_layout_colour("border"))    # Right
+        framebuffer.vline(x_padding, y_top + 6, self.inky_display.HEIGHT - 4, border)                              # Left
+        framebuffer.vline(self.inky_display.WIDTH - x_padding, y_top + 6, self.inky_display.HEIGHT - 4, border)    # Right
         
         # Create progress bar
         # withd of bar = 100%
         # progress needs to be a percentage of this value
-        for p in range(int((progress/100) * (self.inky_display.WIDTH - 12))):
-            for w in range(self.inky_display.HEIGHT - y_top - 11):
-                progressBar_img.putpixel((p + x_padding + 1, y_top + w + 6), self.inky_display.RED)                          # Bar
+        framebuffer.bar(x_padding + 1, y_top + 6, self.inky_display.WIDTH - 5, self.inky_display.HEIGHT - 5, progress, self.inky_display.RED)
 
-        # Create Notches in the progress bar        
+        # Create Notches in the progress bar
         for n in range(self.inky_display.WIDTH - 12):
             if (n+x_padding) % 20 == 0:
-                progressBar_img.putpixel(((n+x_padding+1) + 5, y_top + 6), self.get_layout_colour("border"))
-                progressBar_img.putpixel(((n+x_padding+1) + 5, y_top + 7), self.get_layout_colour("border"))
-                
-                progressBar_img.putpixel(((n+x_padding+1) + 5, self.inky_display.HEIGHT - 6), self.get_layout_colour("border"))
-                progressBar_img.putpixel(((n+x_padding+1) + 5, self.inky_display.HEIGHT - 7), self.get_layout_colour("border"))
+                framebuffer.vline((n+x_padding+1) + 5, y_top + 6, y_top + 8, border)
+                framebuffer.vline((n+x_padding+1) + 5, self.inky_display.HEIGHT - 7, self.inky_display.HEIGHT - 5, border)
+
+    # --- Static Layers --- #
+    def build_layers(self):
+        """
+        Builds the static layers for this resolution and colour mode if they aren't already cached
+        """
+        self.output.debug("Building static layers for %s", "Display", self.layer_cache.key)
+        
+        self.layer_cache.get("base", self.build_base_layer)
+        self.layer_cache.get("bar", self.build_bar_layer)
+        self.layer_cache.get("bar_full", lambda: self.build_bar_layer(100))
+
+    def build_base_layer(self):
+        """
+        Returns:
+            bytearray: A blank background with the line underneath the date and time
+        """
+        layer = FrameBuffer(self.inky_display.WIDTH, self.inky_display.HEIGHT, self.get_layout_colour("background"))
+        layer.fill_rect(0, 30, self.inky_display.WIDTH, 32, self.get_layout_colour("border"))
+        
+        return layer.buffer
+
+    def build_bar_layer(self, progress=0):
+        """
+        Returns:
+            bytearray: The base layer with the progress bar drawn at the given progress
+        """
+        layer = FrameBuffer(self.inky_display.WIDTH, self.inky_display.HEIGHT)
+        layer.buffer[:] = self.layer_cache.get("base", self.build_base_layer)
+        self.draw_progressBar(layer, progress, self.bar_top)
+        
+        return layer.buffer
 
     def get_date_time(self):
         return datetime.datetime.now().strftime("%d/%m"), datetime.datetime.now().strftime("%I:%M")
 
-    def draw_date_time(self):
+    def draw_date_time(self, base_frame=None):
         """
         Draws the date and time and returns their positional values
 
+        Args:
+            base_frame (bytes): Pre-rendered palette bytes to draw on top of, the base layer is used if not given
+
         Returns:
             tuple: A list of the date and time's height, width, x and y values as int
                 date_w (int): The width of the date text in pixels
@@ -313,17 +644,19 @@ class Display:
                 time_x (int): The X position of the time text
         """
         
-        self.clean_area()
-        
-        # Build Image to be displayed
-        self.img = self.create_layout()
+        # Build Image to be displayed, starting from the cached base layer
+        if (base_frame is None):
+            self.img = self.create_layout()
+        else:
+            self.framebuffer.buffer[:] = base_frame
+            self.img = self.framebuffer.commit(self.get_img())
         
         # Draw the date and time
         # Gets the W/H of date and time and sets their positions
         date, local_time = self.get_date_time()
         
-        date_w, date_h = self.HANKEN_BOLD_FONT.getsize(date)
-        time_w, time_h = self.HANKEN_BOLD_FONT.getsize(local_time)
+        date_w, date_h = self.text_metrics.getsize(self.HANKEN_BOLD_FONT, date)
+        time_w, time_h = self.text_metrics.getsize(self.HANKEN_BOLD_FONT, local_time)
 
         date_x = int(((self.inky_display.WIDTH - 5) - date_w))
         time_x = 5
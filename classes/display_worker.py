@@ -0,0 +1,137 @@
+import threading
+import time
+
+
+class DisplayWorker:
+    """
+    Renders to the display on its own thread so a slow e-ink refresh never blocks the main loop.
+
+    Updates are passed through a single slot, if a new update arrives before the last one
+    has been drawn the old one is dropped and only the latest is drawn.
+    """
+
+    def __init__(self, output, watchdog, display, check_in_interval=30):
+        self.output = output
+        self.watchdog = watchdog
+        self.display = display
+        self.check_in_interval = check_in_interval
+
+        self.condition = threading.Condition()
+        self.pending = None
+        self.busy = False
+        self.exit_flag = threading.Event()
+        self.thread = None
+
+        # Metrics
+        self.submitted = 0
+        self.dropped = 0
+        self.rendered = 0
+        self.failed = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def start(self, first_task=None):
+        """
+        Starts the render thread
+
+        Args:
+            first_task (function): Run on the render thread before any updates are drawn, E.g. showing the splash screen
+        """
+        self.output.debug("Starting Display Worker", "Display Worker")
+
+        self.thread = threading.Thread(target=self.render_loop, args=(first_task,), name="DisplayWorker")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stops the render thread once the current render has finished, any pending update is dropped
+        """
+        self.exit_flag.set()
+
+        with self.condition:
+            self.condition.notify_all()
+
+        if (self.thread is not None):
+            self.thread.join(timeout)
+
+    def submit(self, method_name, *args):
+        """
+        Queues an update for the display, replacing any update that hasn't been drawn yet
+
+        Args:
+            method_name (String): Name of the Display method to call, E.g. "update_display_withSong"
+            *args: Arguments passed to the Display method
+        """
+        with self.condition:
+            if (self.pending is not None):
+                self.dropped += 1
+                self.output.debug("Dropping '%s' for a newer update", "Display Worker", self.pending[0])
+
+            self.pending = (method_name, args, time.monotonic())
+            self.submitted += 1
+            self.condition.notify()
+
+    def render_loop(self, first_task=None):
+        if (first_task is not None):
+            self.watchdog.check_in("DisplayWorker")
+            try:
+                first_task()
+            except Exception as Ex:
+                self.output.out(f"Display start-up task failed!\n{Ex}", "Display Worker", status="error")
+
+        while (not self.exit_flag.is_set()):
+            self.watchdog.check_in("DisplayWorker")
+
+            with self.condition:
+                if (self.pending is None):
+                    self.condition.wait(self.check_in_interval)
+
+                if (self.pending is None or self.exit_flag.is_set()):
+                    continue
+
+                method_name, args, submitted_at = self.pending
+                self.pending = None
+                self.busy = True
+
+            try:
+                with self.display.get_stage_timer().span(f"display.{method_name}"):
+                    getattr(self.display, method_name)(*args)
+            except Exception as Ex:
+                self.failed += 1
+                self.output.out(f"Unable to update the display!\n{Ex}", "Display Worker", status="error")
+            else:
+                self.rendered += 1
+            finally:
+                self.busy = False
+
+            # Latency from the update being submitted to it being on the display
+            self.last_latency = time.monotonic() - submitted_at
+            self.max_latency = max(self.max_latency, self.last_latency)
+            self.total_latency += self.last_latency
+
+            self.output.debug("'%s' took %.2fs", "Display Worker", method_name, self.last_latency)
+
+    # --- Metrics --- #
+    def get_queue_depth(self) -> int:
+        return 0 if self.pending is None else 1
+
+    def is_busy(self) -> bool:
+        return self.busy
+
+    def get_dropped(self) -> int:
+        return self.dropped
+
+    def get_rendered(self) -> int:
+        return self.rendered
+
+    def get_last_latency(self) -> float:
+        return self.last_latency
+
+    def get_max_latency(self) -> float:
+        return self.max_latency
+
+    def get_mean_latency(self) -> float:
+        completed = self.rendered + self.failed
+        return self.total_latency / completed if completed else 0.0
@@ -0,0 +1,140 @@
+class FrameBuffer:
+    """
+    A palette framebuffer backed by a single bytearray (one byte per pixel).
+
+    Shapes are written a whole row (or block of rows) at a time using slice assignment
+    instead of setting each pixel individually, the buffer is then copied into a "P" mode
+    PIL Image in one call.
+    """
+
+    def __init__(self, width, height, fill=0):
+        self.width = width
+        self.height = height
+
+        self.buffer = bytearray([fill]) * (width * height)
+
+    # --- Buffer <-> Image --- #
+    def load(self, image):
+        """
+        Copies the pixels of the given "P" mode image into the buffer
+
+        Args:
+            image (Image): Image with the same resolution as the buffer
+        """
+        self.buffer[:] = image.tobytes()
+
+    def commit(self, image):
+        """
+        Copies the buffer into the given "P" mode image in place
+
+        Args:
+            image (Image): Image with the same resolution as the buffer
+
+        Returns:
+            Image: The updated Image object
+        """
+        image.frombytes(bytes(self.buffer))
+        return image
+
+    # --- Primitives --- #
+    def clear(self, colour):
+        """
+        Fills the whole buffer with one colour
+        """
+        self.buffer[:] = bytes([colour]) * len(self.buffer)
+
+    def fill_rect(self, x0, y0, x1, y1, colour):
+        """
+        Fills the rectangle from (x0, y0) up to but not including (x1, y1).
+        The rectangle is clipped to the buffer.
+
+        Args:
+            x0 (int): Left edge
+            y0 (int): Top edge
+            x1 (int): Right edge (exclusive)
+            y1 (int): Bottom edge (exclusive)
+            colour (int): Palette index to fill with
+        """
+        x0, x1 = max(int(x0), 0), min(int(x1), self.width)
+        y0, y1 = max(int(y0), 0), min(int(y1), self.height)
+
+        if (x0 >= x1 or y0 >= y1):
+            return
+
+        row = bytes([colour]) * (x1 - x0)
+
+        # A full width rectangle is one contiguous block
+        if (x0 == 0 and x1 == self.width):
+            self.buffer[y0 * self.width : y1 * self.width] = row * (y1 - y0)
+            return
+
+        for y in range(y0, y1):
+            start = y * self.width + x0
+            self.buffer[start : start + len(row)] = row
+
+    def copy_rect(self, source, x0, y0, x1, y1):
+        """
+        Copies the rectangle from (x0, y0) up to but not including (x1, y1) out of another
+        buffer with the same resolution. The rectangle is clipped to the buffer.
+
+        Args:
+            source (bytes): Palette bytes to copy from, E.g. a cached layer
+        """
+        x0, x1 = max(int(x0), 0), min(int(x1), self.width)
+        y0, y1 = max(int(y0), 0), min(int(y1), self.height)
+
+        if (x0 >= x1 or y0 >= y1):
+            return
+
+        if (x0 == 0 and x1 == self.width):
+            self.buffer[y0 * self.width : y1 * self.width] = source[y0 * self.width : y1 * self.width]
+            return
+
+        for y in range(y0, y1):
+            start = y * self.width
+            self.buffer[start + x0 : start + x1] = source[start + x0 : start + x1]
+
+    def blit(self, data, x, y, width, height):
+        """
+        Copies a block of palette bytes into the buffer with its top left corner at (x, y).
+        The block is clipped to the buffer.
+
+        Args:
+            data (bytes): width * height palette bytes, row by row
+        """
+        x0, x1 = max(int(x), 0), min(int(x) + width, self.width)
+
+        if (x0 >= x1):
+            return
+
+        for row in range(max(-int(y), 0), min(height, self.height - int(y))):
+            start = (int(y) + row) * self.width
+            offset = row * width + (x0 - int(x))
+            self.buffer[start + x0 : start + x1] = data[offset : offset + (x1 - x0)]
+
+    def hline(self, x0, x1, y, colour):
+        """
+        Draws a horizontal line from x0 up to but not including x1
+        """
+        self.fill_rect(x0, y, x1, y + 1, colour)
+
+    def vline(self, x, y0, y1, colour):
+        """
+        Draws a vertical line from y0 up to but not including y1
+        """
+        self.fill_rect(x, y0, x + 1, y1, colour)
+
+    def bar(self, x0, y0, x1, y1, progress, colour):
+        """
+        Fills the left hand part of a rectangle proportional to the progress
+
+        Args:
+            progress (int): Percentage of the rectangle to fill (0 - 100)
+
+        Returns:
+            int: The width of the filled area in pixels
+        """
+        fill_w = int((progress / 100) * (x1 - x0))
+        self.fill_rect(x0, y0, x0 + fill_w, y1, colour)
+
+        return fill_w
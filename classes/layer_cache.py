@@ -0,0 +1,33 @@
+class LayerCache:
+    """
+    Stores pre-rendered static layers as raw palette bytes.
+
+    Layers never change for a given resolution and colour mode, so they are built once and
+    shared by every Display using the same (resolution, colour mode).
+    """
+
+    _layers = {}
+
+    def __init__(self, resolution, colour_mode):
+        self.key = (tuple(resolution), colour_mode)
+
+    def get(self, name, builder=None):
+        """
+        Gets a layer, building it first if it isn't cached yet
+
+        Args:
+            name (String): Name of the layer
+            builder (function): Returns the layer as a bytes-like object if it needs building
+
+        Returns:
+            bytes: The layer, or None if it isn't cached and no builder was given
+        """
+        layers = LayerCache._layers.setdefault(self.key, {})
+
+        if (name not in layers and builder is not None):
+            layers[name] = bytes(builder())
+
+        return layers.get(name)
+
+    def clear(self):
+        LayerCache._layers.pop(self.key, None)
@@ -0,0 +1,158 @@
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsWriter:
+    """
+    Builds a scrape in the Prometheus text format.
+    Each metric family is written once with all its samples, E.g.
+        writer.counter("spotipi_spotify_requests_total", "Spotify requests made", [({"endpoint": "current"}, 12)])
+    """
+
+    def __init__(self, prefix="spotipi_"):
+        self.prefix = prefix
+        self.lines = []
+
+    def family(self, name, metric_type, help_text, samples):
+        """
+        Args:
+            name (String): Metric name, without the prefix
+            metric_type (String): counter, gauge, histogram or summary
+            help_text (String): Description of the metric
+            samples (iterable): (labels, value) of each sample, labels is a dict or None
+        """
+        name = self.prefix + name
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+        for labels, value in samples:
+            self.lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+    def counter(self, name, help_text, samples):
+        self.family(name, "counter", help_text, samples)
+
+    def gauge(self, name, help_text, samples):
+        self.family(name, "gauge", help_text, samples)
+
+    def histogram(self, name, help_text, histograms):
+        """
+        Args:
+            histograms (iterable): (labels, LatencyHistogram) of each histogram
+        """
+        name = self.prefix + name
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} histogram")
+
+        for labels, histogram in histograms:
+            labels = labels or {}
+            for bucket, count in histogram.get_cumulative_counts():
+                self.lines.append(f"{name}_bucket{format_labels({**labels, 'le': format_value(bucket)})} {count}")
+
+            self.lines.append(f"{name}_sum{format_labels(labels)} {format_value(histogram.sum)}")
+            self.lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+    def summary(self, name, help_text, summaries):
+        """
+        Args:
+            summaries (iterable): (labels, quantiles, count, total) of each summary, quantiles is a list of (quantile, value)
+        """
+        name = self.prefix + name
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} summary")
+
+        for labels, quantiles, count, total in summaries:
+            labels = labels or {}
+            for quantile, value in quantiles:
+                self.lines.append(f"{name}{format_labels({**labels, 'quantile': format_value(quantile)})} {format_value(value)}")
+
+            self.lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+            self.lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+    def get_text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def format_labels(labels):
+    if (not labels):
+        return ""
+
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def format_value(value):
+    if (isinstance(value, bool)):
+        return "1" if value else "0"
+
+    if (isinstance(value, float) and math.isinf(value)):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves /metrics
+    """
+
+    def do_GET(self):
+        if (self.path.split("?")[0] != "/metrics"):
+            self.send_text("Not found\n", 404)
+            return
+
+        writer = MetricsWriter()
+        try:
+            self.server.collect(writer)
+        except Exception as Ex:
+            self.send_text(f"Unable to collect the metrics: {Ex}\n", 500)
+            return
+
+        self.send_text(writer.get_text())
+
+    def send_text(self, text, status=200):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Every scrape would otherwise be written to stderr
+        self.server.output.debug(format, "Metrics Server", *args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Serves the metrics in the Prometheus text format on localhost.
+
+    Nothing is recorded for the endpoint, collect reads the counters and histograms the classes
+    already keep when a scrape arrives, so between scrapes it costs nothing.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, output, collect, host="127.0.0.1", port=9464):
+        """
+        Args:
+            output (Output): Output class
+            collect (function): Called with a MetricsWriter for each scrape
+            host (String): Address to listen on, localhost so the metrics aren't exposed to the network
+            port (int): Port to listen on
+        """
+        super().__init__((host, port), MetricsHandler)
+        self.output = output
+        self.collect = collect
+        self.thread = None
+
+    def start(self):
+        self.output.out(f"Serving metrics on http://{self.server_address[0]}:{self.server_address[1]}/metrics", "Metrics Server")
+
+        self.thread = threading.Thread(target=self.serve_forever, name="MetricsServer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
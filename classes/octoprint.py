@@ -1,10 +1,42 @@
-
-
 import json
 import os
+import socket
+import threading
+import time
+from typing import NamedTuple
 from dotenv import load_dotenv
 import requests
 
+from classes.request_guard import LatencyHistogram
+from classes.state_store import StateStore
+
+
+class PrinterState(NamedTuple):
+    """
+    An immutable snapshot of the printer
+    """
+    isPrinting: bool = False
+    progress: float = 0
+    print_time_left: float = None   # OctoPrint's estimate of the seconds left when the progress was sampled
+    sampled_at: float = 0.0         # Monotonic time the progress was sampled
+
+    def get_progress(self, now=None):
+        """
+        Interpolates the progress from the last sample, using up the remaining percentage
+        evenly over OctoPrint's estimate of the time that was left
+
+        Args:
+            now (float): Monotonic time to interpolate to, defaults to now
+
+        Returns:
+            float: The progress as a percentage
+        """
+        if (not self.isPrinting or not self.print_time_left):
+            return self.progress
+
+        elapsed = max((time.monotonic() if now is None else now) - self.sampled_at, 0)
+        return self.progress + (100 - self.progress) * min(elapsed / self.print_time_left, 1)
+
 
 class OctoPrintValues:
     """
@@ -12,22 +44,65 @@ class OctoPrintValues:
     """
 
     def __init__(self):
-        self.isPrinting = False
-        self.progress = 0
+        # The version only changes when the printer starts or stops printing or a new progress is sampled
+        self.state = StateStore(PrinterState())
+
+    def publish(self, isPrinting, progress=None, print_time_left=None, sampled_at=None):
+        """
+        Publishes the printer state, the progress is kept if not given
+
+        Args:
+            isPrinting (Boolean): If the printer is printing
+            progress (float): The sampled progress as a percentage
+            print_time_left (float): OctoPrint's estimate of the seconds left, used to interpolate the progress
+            sampled_at (float): Monotonic time of the sample, defaults to now
+        """
+        current = self.state.get()
+        if (progress is None):
+            new_state = current._replace(isPrinting=isPrinting)
+        else:
+            new_state = PrinterState(isPrinting, progress, print_time_left,
+                                     time.monotonic() if sampled_at is None else sampled_at)
+
+        self.state.publish(new_state, changed=new_state != current)
+
+    def get_snapshot(self):
+        """
+        Returns:
+            tuple: The version and the PrinterState snapshot
+        """
+        return self.state.get_snapshot()
 
     # --- is printing --- #
     def set_isPrinting(self, isPrinting):
-        self.isPrinting = isPrinting
+        self.publish(isPrinting)
         
     def get_isPrinting(self):
-        return self.isPrinting
+        return self.state.get().isPrinting
 
     # --- Progress --- #
     def set_progress(self, progress):
-        self.progress = progress
+        self.publish(self.state.get().isPrinting, progress)
 
     def get_progress(self) -> int:
-        return int(self.progress)
+        """
+        Returns:
+            int: The progress interpolated from the last sample
+        """
+        return int(self.state.get().get_progress())
+
+
+class PrinterSnapshot(NamedTuple):
+    """
+    The printer and job state from one /api/job request
+    """
+    connected: bool = False         # The OctoPrint server answered
+    operational: bool = False       # The printer is connected to the OctoPrint server
+    state: str = None               # E.g. Operational, Printing, Paused, Offline
+    progress: float = None          # Job completion as a percentage, None if there is no job
+    print_time: float = None        # Seconds the job has been printing for
+    print_time_left: float = None   # OctoPrint's estimate of the seconds left
+    fetched_at: float = 0.0         # Monotonic time of the request
 
 
 class OctoPrintAPI:
@@ -35,13 +110,32 @@ class OctoPrintAPI:
     This Class is an interface for the Octoprint server API
     """
 
-    def __init__(self, host="octopi.local", port=80):
+    # Job states where the printer isn't connected to the OctoPrint server
+    OFFLINE_STATES = ("offline", "closed", "error", "unknown")
+
+    def __init__(self, host="octopi.local", port=80, cache_ttl=5, timeout=(2, 5), resolve_ttl=300,
+                 probe_interval=15, max_probe_interval=300, probe_timeout=1, api_key=None, output=None):
+        """
+        Args:
+            host (String): Host name of the OctoPrint server
+            port (int): Port of the OctoPrint server
+            cache_ttl (float): Seconds a snapshot is reused for before the server is asked again
+            timeout (tuple): Connect and read timeouts of each request
+            resolve_ttl (float): Seconds the resolved address of the host is used before it is looked up again
+            probe_interval (float): Seconds after a failed request before the server is probed again,
+                doubling after each failed probe up to max_probe_interval
+            probe_timeout (float): Connect timeout of the probe
+            api_key (String): OctoPrint API key, defaults to the API_KEY environment variable
+            output (Output): Output class, errors aren't logged if not given
+        """
+        self.output = output
+        
         # Loads the enviroment variables (api keys)
         load_dotenv()
         
         self.host = host
         self.port = port
-        self.api_key = os.getenv("API_KEY")
+        self.api_key = api_key if api_key is not None else os.getenv("API_KEY")
         self.session = requests.Session()
             
         self.session.headers.update({'X-Api-Key': self.api_key,
@@ -49,62 +143,223 @@ class OctoPrintAPI:
 
         # Base address for all the requests
         self.base_address = 'http://' + self.host + ':' + str(self.port)
+        
+        self.cache_ttl = cache_ttl
+        self.snapshot = None
+        self.lock = threading.Lock()
+        
+        self.timeout = timeout
+        
+        # Resolving octopi.local over mDNS can take seconds, so the address is cached and revalidated
+        self.resolve_ttl = resolve_ttl
+        self.address = None
+        self.resolved_at = 0.0
+        
+        # While offline no requests are made until a probe of the server succeeds
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.probe_timeout = probe_timeout
+        self.offline_delay = 0
+        self.offline_until = 0.0
+        
+        # Number of HTTP requests made to the server
+        self.requests = 0
+        self.probes = 0
+        self.fast_fails = 0
+        # Snapshots served from the cache, and the latency of each /api/job request
+        self.cache_hits = 0
+        self.latency = LatencyHistogram()
     
     
-    def is_printer_connected(self):
+    def get_snapshot(self, max_age=None):
         """
-        Checks if the printer is connected to the Octoprint server
+        Gets the printer and job state, from the cache if it was fetched within max_age seconds.
+        /api/job reports both the printer state text and the job progress, so only one request is needed.
+
+        Args:
+            max_age (float): Oldest cached snapshot to accept, defaults to cache_ttl
+
+        Returns:
+            PrinterSnapshot: The printer state, connected is False if the server couldn't be reached
+        """
+        max_age = self.cache_ttl if max_age is None else max_age
+        
+        with self.lock:
+            if (self.snapshot is not None and time.monotonic() - self.snapshot.fetched_at < max_age):
+                self.cache_hits += 1
+                return self.snapshot
+            
+            self.snapshot = self.fetch_snapshot()
+            return self.snapshot
+
+
+    def set_snapshot(self, snapshot):
+        """
+        Replaces the cached snapshot, E.g. with one from the push API, so get_snapshot serves it without a request
+        """
+        with self.lock:
+            self.snapshot = snapshot
+
+
+    def login(self):
+        """
+        Logs in passively with the API key to get a session for the push API
 
         Returns:
-            String: Returns the 'operational' value if connected
-            Boolean: Returns False if the printer is not connected
+            dict: The user, with the 'name' and 'session' keys
         """
+        self.requests += 1
+        r = self.session.post(self.base_address + '/api/login', json={"passive": True}, timeout=10)
+        r.raise_for_status()
+        
+        return r.json()
+
 
+    def fetch_snapshot(self):
+        """
+        Requests /api/job and parses it into a PrinterSnapshot.
+        While the printer is offline no request is made until the next probe of the server succeeds.
+        """
+        fetched_at = time.monotonic()
+        
+        if (self.offline_delay):
+            if (fetched_at < self.offline_until):
+                self.fast_fails += 1
+                return PrinterSnapshot(fetched_at=fetched_at)
+            
+            if (not self.probe()):
+                self.mark_offline()
+                return PrinterSnapshot(fetched_at=fetched_at)
+        
+        try:
+            self.requests += 1
+            r = self.session.get(self.get_address() + '/api/job', headers={'Host': self.get_host_header()}, timeout=self.timeout)
+        except (OSError, requests.RequestException) as Ex:
+            self.latency.observe(time.monotonic() - fetched_at)
+            self.mark_offline()
+            return PrinterSnapshot(fetched_at=fetched_at)
+        
+        self.latency.observe(time.monotonic() - fetched_at)
+        self.mark_online()
+        
+        if r.status_code != 200:
+            if (self.output is not None):
+                self.output.out("/api/job returned status code %d: %s", "OctoPrint API", r.status_code,
+                                r.content.decode('utf-8', 'replace'), status="error")
+            return PrinterSnapshot(connected=True, fetched_at=fetched_at)
+        
         try:
-            r = self.session.get(self.base_address + '/api/printer')
+            job = json.loads(r.content.decode('utf-8'))
+            state = job.get("state") or "Unknown"
+            progress = job.get("progress") or {}
         except Exception as Ex:
-            return False
+            if (self.output is not None):
+                self.output.out("Unable to parse the /api/job response: %s", "OctoPrint API", Ex, status="error")
+            return PrinterSnapshot(connected=True, fetched_at=fetched_at)
         
-        else:
-            if r.status_code != 200:
-                print(f"ERROR: Status code {r.status_code}")
-                print(f"ERROR: {r.content.decode('utf-8')}")
-                return False
-                
+        return PrinterSnapshot(connected=True,
+                               operational=not state.lower().startswith(self.OFFLINE_STATES),
+                               state=state,
+                               progress=progress.get("completion"),
+                               print_time=progress.get("printTime"),
+                               print_time_left=progress.get("printTimeLeft"),
+                               fetched_at=fetched_at)
+
+
+    # --- Address and offline state --- #
+    def resolve(self):
+        """
+        Resolves the host, reusing the last address for resolve_ttl seconds.
+        If the lookup fails the last address is kept until the next revalidation.
+
+        Returns:
+            String: The IP address of the host
+
+        Raises:
+            OSError: Raised if the host has never been resolved and can't be
+        """
+        now = time.monotonic()
+        
+        if (self.address is None or now - self.resolved_at >= self.resolve_ttl):
             try:
-                return json.loads(r.content.decode('utf-8'))["state"]["flags"]["operational"]
-            except Exception as Ex:
-                print(f"Unable to load result!\n{Ex}")
-                return False
+                self.address = socket.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)[0][4][0]
+            except OSError:
+                if (self.address is None):
+                    raise
+            
+            self.resolved_at = now
+        
+        return self.address
 
 
-    def get_printer_status(self):
+    def get_address(self):
         """
-        Get the printer status
+        Returns:
+            String: The base address of the server using its resolved IP address
+        """
+        address = self.resolve()
+        if (":" in address):
+            address = f"[{address}]"
+        
+        return f"http://{address}:{self.port}"
+
+
+    def get_host_header(self):
+        return self.host if self.port == 80 else f"{self.host}:{self.port}"
+
+
+    def probe(self):
+        """
+        Checks the server is accepting connections, far cheaper than a request that has to time out
 
         Returns:
-            String: Returns the json string value if recieves a 200 status
-            Boolean: Returns False if unable to get status
+            Boolean: True if a connection could be opened
         """
+        self.probes += 1
         
         try:
-            r = self.session.get(self.base_address + '/api/printer')
-        except Exception as Ex:
-            print(f"Unable to get base address!")
+            with socket.create_connection((self.resolve(), self.port), timeout=self.probe_timeout):
+                return True
+        except OSError:
             return False
-        
-        else:
-            if r.status_code != 200:
-                print(f"ERROR: Status code {r.status_code}")
-                print(f"ERROR: {r.content.decode('utf-8')}")
-                return False
-            
-            try:
-                return json.loads(r.content.decode('utf-8'))["state"]["text"]
-            except Exception as Ex:
-                print("ERROR: Unable to parse json")
-                print(f"{Ex.__cause__} \n {Ex.__traceback__}")
-                return False
+
+
+    def mark_offline(self):
+        """
+        Stops requests until the next probe, the wait doubles each time the printer is still offline
+        """
+        self.offline_delay = min(self.offline_delay * 2, self.max_probe_interval) if self.offline_delay else self.probe_interval
+        self.offline_until = time.monotonic() + self.offline_delay
+
+
+    def mark_online(self):
+        self.offline_delay = 0
+        self.offline_until = 0.0
+
+
+    def is_offline(self) -> bool:
+        return self.offline_delay != 0
+
+
+    def is_printer_connected(self):
+        """
+        Checks if the printer is connected to the Octoprint server
+
+        Returns:
+            Boolean: Returns True if the printer is operational, False if not or the server can't be reached
+        """
+        return self.get_snapshot().operational
+
+
+    def get_printer_status(self):
+        """
+        Get the printer status
+
+        Returns:
+            String: Returns the state text, E.g. "Printing"
+            Boolean: Returns False if unable to get status
+        """
+        return self.get_snapshot().state or False
 
 
     def get_print_progress(self):
@@ -112,25 +367,28 @@ class OctoPrintAPI:
         Get the print progress as a percentage
 
         Returns:
-            int: The progress of the printer
+            float: The progress of the printer
             Boolean: Returns False if unable to get progress
         """
-        
-        try:
-            results = self.session.get(self.base_address + '/api/job')
-        except Exception as Ex:
-            print(f"{Ex.__cause__} \n {Ex.__traceback__}")
-            return False
-        
-        else:
-            if results.status_code != 200:
-                print(f"ERROR: Status code {results.status_code}")
-                print(f"ERROR: {results.content.decode('utf-8')}")
-                return False
-            
-            try:
-                return json.loads(results.content.decode('utf-8'))["progress"]["completion"]
-            except Exception as Ex:
-                print("ERROR: Unable to parse json")
-                print(f"{Ex.__cause__} \n {Ex.__traceback__}")
-                return False
+        progress = self.get_snapshot().progress
+        return False if progress is None else progress
+
+
+    def get_request_count(self) -> int:
+        return self.requests
+
+
+    def get_probe_count(self) -> int:
+        return self.probes
+
+
+    def get_fast_fail_count(self) -> int:
+        return self.fast_fails
+
+
+    def get_cache_hits(self) -> int:
+        return self.cache_hits
+
+
+    def get_latency(self):
+        return self.latency
@@ -0,0 +1,162 @@
+import json
+import random
+import threading
+import time
+
+import websocket
+
+from classes.octoprint import PrinterSnapshot
+
+
+class OctoPrintPush:
+    """
+    Subscribes to the OctoPrint push API on a background thread.
+
+    Every 'current' and 'history' message updates OctoPrintValues and replaces the OctoPrintAPI snapshot,
+    so get_snapshot serves the pushed state without a request. If the connection drops the pushed
+    snapshot goes stale after the API's cache_ttl and get_snapshot falls back to polling /api/job
+    while the client reconnects with exponential backoff.
+    """
+
+    def __init__(self, output, api, values, throttle=2, base_backoff=1, max_backoff=60, timeout=30):
+        """
+        Args:
+            output (Output): Output class
+            api (OctoPrintAPI): Used to log in and holds the latest snapshot
+            values (OctoPrintValues): Published to on every push message, None to only update the API snapshot
+            throttle (int): Multiplier of OctoPrint's 0.5 second 'current' message interval
+            base_backoff (float): First wait before reconnecting
+            max_backoff (float): Longest wait before reconnecting
+            timeout (float): Seconds without a message before the connection is treated as dropped
+        """
+        self.output = output
+        self.api = api
+        self.values = values
+        self.throttle = throttle
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.url = "ws" + api.base_address[len("http"):] + "/sockjs/websocket"
+
+        self.exit_flag = threading.Event()
+        self.thread = None
+        self.connection = None
+
+        # Stats
+        self.connected = False
+        self.connects = 0
+        self.messages = 0
+        self.messages_this_connection = 0
+
+    def start(self):
+        self.output.debug("Starting OctoPrint push client for '%s'", "OctoPrint Push", self.url)
+
+        self.thread = threading.Thread(target=self.push_loop, name=f"OctoPrintPush-{self.api.host}")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.exit_flag.set()
+
+        connection = self.connection
+        if (connection is not None):
+            connection.close()
+
+        if (self.thread is not None):
+            self.thread.join(timeout)
+
+    def push_loop(self):
+        """
+        Connects and reads messages until stopped, reconnecting with jittered exponential backoff
+        """
+        failures = 0
+
+        while (not self.exit_flag.is_set()):
+            try:
+                self.listen()
+            except Exception as Ex:
+                if (self.exit_flag.is_set()):
+                    break
+
+                self.output.debug("Push connection lost: %s", "OctoPrint Push", Ex)
+            finally:
+                self.connected = False
+                self.connection = None
+
+            # A connection that delivered messages starts the backoff again
+            failures = 1 if self.messages_this_connection else failures + 1
+            delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** failures))
+
+            self.output.debug("Reconnecting in %.1fs", "OctoPrint Push", delay)
+            self.exit_flag.wait(delay)
+
+    def listen(self):
+        """
+        Logs in, subscribes and applies each message until the connection closes
+        """
+        self.messages_this_connection = 0
+
+        user = self.api.login()
+
+        self.connection = websocket.create_connection(self.url, timeout=self.timeout)
+        self.connection.send(json.dumps({"auth": f"{user['name']}:{user['session']}"}))
+        self.connection.send(json.dumps({"throttle": self.throttle}))
+
+        self.connected = True
+        self.connects += 1
+        self.output.out("Connected to the OctoPrint push API", "OctoPrint Push", status="success")
+
+        while (not self.exit_flag.is_set()):
+            message = self.connection.recv()
+            if (not message):
+                raise ConnectionError("Connection closed by the server")
+
+            self.handle_message(json.loads(message))
+
+    def handle_message(self, message):
+        if ("reauthRequired" in message):
+            raise ConnectionError("Session expired, logging in again")
+
+        for key in ("current", "history"):
+            if (key in message):
+                self.apply(message[key])
+
+    def apply(self, data):
+        """
+        Publishes the printer state from a 'current' or 'history' message
+        """
+        self.messages += 1
+        self.messages_this_connection += 1
+
+        state = data.get("state") or {}
+        flags = state.get("flags") or {}
+        progress = data.get("progress") or {}
+
+        snapshot = PrinterSnapshot(connected=True,
+                                   operational=bool(flags.get("operational")),
+                                   state=state.get("text"),
+                                   progress=progress.get("completion"),
+                                   print_time=progress.get("printTime"),
+                                   print_time_left=progress.get("printTimeLeft"),
+                                   fetched_at=time.monotonic())
+
+        self.api.set_snapshot(snapshot)
+
+        if (self.values is None):
+            return
+
+        if (flags.get("printing")):
+            self.values.publish(True, snapshot.progress or 0, snapshot.print_time_left, snapshot.fetched_at)
+        else:
+            self.values.set_isPrinting(False)
+
+    # --- Stats --- #
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def get_connects(self) -> int:
+        return self.connects
+
+    def get_messages(self) -> int:
+        return self.messages
@@ -1,123 +1,406 @@
+import atexit
+import collections
 import datetime
+import gzip
+import os
+import queue
+import sys
+import threading
+import time
+
+
+# Record levels, a record is only queued if its level is at least the Output's level
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+# Level of each status passed to Output.out
+STATUS_LEVELS = {"debug": DEBUG, "warning": WARNING, "error": ERROR, "failed": ERROR}
+
+
+class LogFileSink:
+    """
+    Appends log lines to a gzip file in batches, so the SD card sees a few large writes instead of
+    one per line. Each batch is a gzip member, the file can be read with zcat.
+    Once the file passes max_bytes it is rotated to path.1, path.2 and so on, keeping backups files.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024, backups=3, flush_bytes=64 * 1024, flush_interval=300):
+        """
+        Args:
+            path (String): The log file, E.g. logs/spotipi.log.gz
+            max_bytes (int): Compressed size the file is rotated at
+            backups (int): Number of rotated files to keep
+            flush_bytes (int): Lines are written once this many bytes are buffered
+            flush_interval (float): Or once the oldest buffered line is this many seconds old
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.buffered_since = None
+        self.writes = 0
+
+        directory = os.path.dirname(path)
+        if (directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, line):
+        if (not self.buffer):
+            self.buffered_since = time.monotonic()
+
+        self.buffer.append(line)
+        self.buffered_bytes += len(line) + 1
+
+        if (self.buffered_bytes >= self.flush_bytes):
+            self.flush()
+
+    def is_flush_due(self) -> bool:
+        return bool(self.buffer) and time.monotonic() - self.buffered_since >= self.flush_interval
+
+    def flush(self):
+        if (not self.buffer):
+            return
+
+        with gzip.open(self.path, "ab") as log_file:
+            log_file.write(("\n".join(self.buffer) + "\n").encode("utf-8"))
+
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.writes += 1
+
+        if (os.path.getsize(self.path) >= self.max_bytes):
+            self.rotate()
+
+    def rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            if (os.path.exists(f"{self.path}.{index}")):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+
+        os.replace(self.path, f"{self.path}.1")
+
+    def get_writes(self) -> int:
+        return self.writes
 
 
 class Output:
-    def __init__(self, isDebugging, area_length=15, status_area=7) -> None:
+    """
+    Level-gated output written by a background thread.
+
+    Each call only checks the level and queues the raw values, the timestamp, padding and any
+    '%' arguments are formatted on the writer thread, so a slow terminal or SD card never blocks
+    the caller and a disabled debug call costs one comparison.
+    If the queue fills up new records are dropped rather than blocking.
+
+    The writer keeps the last ring_size records in memory, they can be dumped on demand with dump(),
+    E.g. from a signal handler, and are sent to the log file sink if there is one.
+    """
+
+    def __init__(self, isDebugging, area_length=15, status_area=7, stream=None, max_queue=1000,
+                 ring_size=500, ring_level=INFO, log_file=None) -> None:
+        """
+        Args:
+            isDebugging (Boolean): Enables debug and WatchDog output
+            stream (file): Where records are written, defaults to sys.stdout
+            max_queue (int): Most records waiting to be written before new ones are dropped
+            ring_size (int): Number of records kept in memory for dump()
+            ring_level (int): Lowest level kept in memory and written to the log file, even if it isn't output
+            log_file (LogFileSink): Where records are also written in batches, None to only output them
+        """
         self.isDebugging = isDebugging
+        self.level = DEBUG if isDebugging else INFO
+        # Records below the output level are still queued for the ring buffer and log file
+        self.capture_level = min(self.level, ring_level)
 
         self.area_length = area_length
         self.status_area = status_area
+        self.stream = stream
 
+        self.ring = collections.deque(maxlen=ring_size)
+        self.log_file = log_file
 
-    def out(self, text, area, status="info"):
-        current_time = datetime.datetime.now().strftime("%I:%M")
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+        self.writer = threading.Thread(target=self.write_loop, name="OutputWriter")
+        self.writer.daemon = True
+        self.writer.start()
+
+        # Write anything still queued when the program exits
+        atexit.register(self.close)
+
+
+    # --- Records --- #
+    def is_enabled(self, level) -> bool:
+        return level >= self.capture_level
+
+
+    def emit(self, level, formatter, *args):
+        """
+        Queues a record, formatter(created, *args) is called on the writer thread to build its text
+        """
+        try:
+            self.queue.put_nowait((time.time(), level, formatter, args))
+        except queue.Full:
+            self.dropped += 1
+
+
+    def out(self, text, area, *args, status="info"):
+        """
+        Args:
+            text (String): The message, formatted with '%' and args on the writer thread if any are given
+            area (String): The area of code the message is from
+            status (String): E.g. info, success, warning, error. Keyword only so lazy args can follow area, like debug
+        """
+        level = STATUS_LEVELS.get(status, INFO)
+        if (level >= self.capture_level):
+            self.emit(level, self.format_line, area, status, text, args)
 
-        if (len(area) <= self.area_length):
-            area = area + " "*(self.area_length - len(area))
-        else:
-            area = area[:len(area) - (len(area) - self.area_length)]
 
-        if (len(status) <= self.status_area):
-            status = status + " "*(self.status_area - len(status))
-        else:
-            status = status[:len(status) - (len(status) - self.status_area)]
-        
-        print(f"[{current_time}] [{area}] [{status.upper()}] >> {text}")
-            
-        
-        
     def banner(self, *text, area, status="info", min_length=35):
-        current_time = datetime.datetime.now().strftime("%I:%M")
-        
-        if (len(area) <= self.area_length):
-            area = area + " "*(self.area_length - len(area))
-        else:
-            area = area[:len(area) - (len(area) - self.area_length)]
+        level = STATUS_LEVELS.get(status, INFO)
+        if (level >= self.capture_level):
+            self.emit(level, self.format_banner, area, status, text, min_length)
 
-        if (len(status) <= self.status_area):
-            status = status + " "*(self.status_area - len(status))
-        else:
-            status = status[:len(status) - (len(status) - self.status_area)]
-        
+
+    def octoPrintProgress(self, area, progress):
+        if (INFO >= self.capture_level):
+            self.emit(INFO, self.format_progress, area, progress)
+
+
+    def debug(self, text, area, *args):
+        if (DEBUG >= self.capture_level):
+            self.emit(DEBUG, self.format_line, area, "debug", text, args)
+
+
+    def watchdog_out(self, text, *args, blockPosition=None):
+        if (DEBUG >= self.capture_level):
+            self.emit(DEBUG, self.format_watchdog, text, args, blockPosition)
+
+
+    def startup(self, version=0):
+        self.emit(INFO, self.format_startup, version)
+
+
+    # --- Formatting, runs on the writer thread --- #
+    def get_prefix(self, created, area, status):
+        current_time = datetime.datetime.fromtimestamp(created).strftime("%I:%M")
+
+        return f"[{current_time}] [{area:<{self.area_length}.{self.area_length}}] [{status.upper():<{self.status_area}.{self.status_area}}] >>"
+
+
+    def format_line(self, created, area, status, text, args):
+        text = str(text) % args if args else text
+
+        return f"{self.get_prefix(created, area, status)} {text}"
+
+
+    def format_banner(self, created, area, status, text, min_length):
         # Calculate the maximum length of the lines for proper banner width
         max_length = max(len(line) for line in text)
         max_length = max_length + 4 if max_length > min_length else min_length
         border = "=" * max_length  # Adjust for padding and borders
 
-        print()
-        print(f"[{current_time}] [{area}] [{status.upper()}] >>")
-
-        print(border, "\n")
+        lines = ["", self.get_prefix(created, area, status), border, ""]
         for line in text:
-            print(f"|{line.strip().center(max_length - 2)}|\n")
-        print(border)
-        print()
-        
+            lines.append(f"|{line.strip().center(max_length - 2)}|\n")
+        lines += [border, ""]
 
-    def octoPrintProgress(self, area, progress):
-        current_time = datetime.datetime.now().strftime("%I:%M")
-        
-        if (len(area) <= self.area_length):
-            area = area + " "*(self.area_length - len(area))
+        return "\n".join(lines)
+
+
+    def format_progress(self, created, area, progress):
+        bar = int((progress * 20) / 100)
+
+        return "\n".join([f"{self.get_prefix(created, area, 'progres')} \n",
+                          "=" * 22,
+                          "|" + ">" * bar + " " * (20 - bar) + "|   " + str(progress) + "%",
+                          "=" * 22])
+
+
+    def format_watchdog(self, created, text, args, blockPosition):
+        current_time = datetime.datetime.fromtimestamp(created).strftime("%I:%M")
+        text = str(text) % args if args else text
+        output_text = f"[{current_time}][WatchDog] >> {text}"
+
+        if (blockPosition == "start"):
+            output_text = f"{'='*60}\n{output_text}"
+        elif (blockPosition == "end"):
+            output_text = f"{output_text}\n{'='*60}"
+        elif (blockPosition == "none"):
+            output_text = output_text
         else:
-            area = area[:len(area) - (len(area) - self.area_length)]
-        
-        print(f"[{current_time}] [{area}] [PROGRES] >> \n")
-        
-        print("="*22)
-        print("|" + ">"*(int((progress * 20) / 100)) + " "*(20 - int(((progress * 20) / 100))) + "|   " + str(progress) + "%")
-        print("="*22)
-
-
-    def debug(self, text, area):
-        if (self.get_isDebugging()):
-            current_time = datetime.datetime.now().strftime("%I:%M")
-
-            if (len(area) <= self.area_length):
-                area = area + " "*(self.area_length - len(area))
-            else:
-                area = area[:len(area) - (len(area) - self.area_length)]
-
-            print(f"[{current_time}] [{area}] [DEBUG  ] >> {text}")
-            
-            
-    def watchdog_out(self, text, blockPosition=None):
-        if (self.get_isDebugging()):
-            current_time = datetime.datetime.now().strftime("%I:%M")
-            output_text = f"[{current_time}][WatchDog] >> {text}"
-            
-            if (blockPosition == "start"):
-                output_text = f"{'='*60}\n{output_text}"
-            elif (blockPosition == "end"):
-                output_text = f"{output_text}\n{'='*60}"
-            elif (blockPosition == "none"):
-                output_text = output_text
-            else:
-                output_text = f"{'='*60}\n{output_text}\n{'='*60}"
-
-            print(output_text)
+            output_text = f"{'='*60}\n{output_text}\n{'='*60}"
+
+        return output_text
+
+
+    def format_startup(self, created, version):
+        return f"""
+ ____                    __        ____
+/\\  _`\\                 /\\ \\__  __/\\  _`\\   __
+\\ \\,\\L\\_\\  _____     ___\\ \\ ,_\\/\\_\\ \\ \\L\\ \\/\\_\\
+ \\/_\\__ \\ /\\ '__`\\  / __`\\ \\ \\/\\/\\ \\ \\ ,__/\\/\\ \\
+   /\\ \\L\\ \\ \\ \\L\\ \\/\\ \\L\\ \\ \\ \\_\\ \\ \\ \\ \\/  \\ \\ \\
+   \\ `\\____\\ \\ ,__/\\ \\____/\\ \\___\\ \\_\\ \\_\\   \\ \\_\\
+    \\/_____/\\ \\ \\/  \\/___/  \\/__/ \\/_/\\/_/    \\/_/
+             \\ \\_\\
+              \\/_/
+
+==================================================
+
+Startup Sucsessful
+Version: {version}
+
+=================================================="""
+
+
+    def dump(self, reason="requested"):
+        """
+        Writes the ring buffer to the output and the log file, once the records already queued are written.
+        The dump is done by the writer thread.
+        """
+        try:
+            self.queue.put_nowait((time.time(), None, None, (reason,)))
+        except queue.Full:
+            self.dropped += 1
+
+
+    # --- Writer --- #
+    def write_loop(self):
+        """
+        Writes queued records in batches, one write and flush per batch
+        """
+        running = True
+
+        while (running):
+            try:
+                batch = [self.queue.get(timeout=self.get_flush_timeout())]
+            except queue.Empty:
+                self.flush_log_file()
+                continue
+
+            while (len(batch) < 100):
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for record in batch:
+                if (record is None):
+                    running = False
+                    continue
+
+                created, level, formatter, args = record
+
+                if (formatter is None):
+                    lines.extend(self.format_dump(created, *args))
+                    continue
+
+                try:
+                    text = formatter(created, *args)
+                except Exception as Ex:
+                    text = f"Unable to format output: {Ex}"
+
+                self.ring.append(text)
+                if (self.log_file is not None):
+                    self.log_file.write(text)
+
+                if (level >= self.level):
+                    lines.append(text)
+
+            try:
+                if (lines):
+                    stream = self.stream if self.stream is not None else sys.stdout
+                    stream.write("\n".join(lines) + "\n")
+                    stream.flush()
+
+                if (not running or (self.log_file is not None and self.log_file.is_flush_due())):
+                    self.flush_log_file()
+            except Exception:
+                pass
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+    def format_dump(self, created, reason):
+        """
+        Returns:
+            list: The lines of the ring buffer dump, the log file is flushed with the dump added
+        """
+        current_time = datetime.datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+        lines = [f"{'='*60}", f"Last {len(self.ring)} records at {current_time} ({reason})", f"{'='*60}",
+                 *self.ring, f"{'='*60}"]
+
+        if (self.log_file is not None):
+            for line in lines:
+                self.log_file.write(line)
+            self.flush_log_file()
+
+        return lines
+
+
+    def flush_log_file(self):
+        if (self.log_file is None):
+            return
+
+        try:
+            self.log_file.flush()
+        except OSError as Ex:
+            self.dropped += len(self.log_file.buffer)
+            self.log_file.buffer = []
+            self.log_file.buffered_bytes = 0
+            sys.stderr.write(f"Unable to write the log file: {Ex}\n")
+
+
+    def get_flush_timeout(self):
+        """
+        Returns:
+            float: Longest the writer can wait for a record before the log file needs flushing
+        """
+        if (self.log_file is None or not self.log_file.buffer):
+            return None
+
+        return max(self.log_file.flush_interval - (time.monotonic() - self.log_file.buffered_since), 0)
+
+
+    def flush(self):
+        """
+        Blocks until everything queued so far has been written
+        """
+        if (self.writer.is_alive()):
+            self.queue.join()
+
+
+    def close(self, timeout=2):
+        """
+        Writes what is queued then stops the writer thread
+        """
+        if (not self.writer.is_alive()):
+            return
+
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+
+        self.writer.join(timeout)
 
 
     def get_isDebugging(self):
         return self.isDebugging
 
 
-    def startup(self, version=0):
-        print("""
- ____                    __        ____           
-/\  _`\                 /\ \__  __/\  _`\   __    
-\ \,\L\_\  _____     ___\ \ ,_\/\_\ \ \L\ \/\_\   
- \/_\__ \ /\ '__`\  / __`\ \ \/\/\ \ \ ,__/\/\ \  
-   /\ \L\ \ \ \L\ \/\ \L\ \ \ \_\ \ \ \ \/  \ \ \ 
-   \ `\____\ \ ,__/\ \____/\ \___\\ \_\ \_\   \ \_\    
-    \/_____/\ \ \/  \/___/  \/__/ \/_/\/_/    \/_/
-             \ \_\                                
-              \/_/
+    def get_dropped(self) -> int:
+        return self.dropped
 
-==================================================
-            """)
-        
-        print("Startup Sucsessful")
-        print(f"Version: {version}")
-        print("")
-        print("==================================================")
+
+    def get_ring(self):
+        return list(self.ring)
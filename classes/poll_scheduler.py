@@ -0,0 +1,54 @@
+class PollScheduler:
+    """
+    Works out how long the Spotify loop should wait before polling again.
+
+    While a song is playing the next poll is timed for just after the song is predicted to end,
+    capped at max_interval so skipped songs are still picked up. Once the predicted end has
+    passed it polls every min_interval until the next song is seen.
+    While paused or stopped the wait doubles on every poll, from idle_min up to idle_max.
+    """
+
+    def __init__(self, min_interval=2, max_interval=30, end_offset=1, idle_min=5, idle_max=120):
+        """
+        Args:
+            min_interval (float): Shortest wait, used around the end of a song
+            max_interval (float): Longest wait while a song is playing
+            end_offset (float): How long after the predicted end of the song to poll
+            idle_min (float): First wait after playback pauses or stops
+            idle_max (float): Longest wait while paused or stopped
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.end_offset = end_offset
+        self.idle_min = idle_min
+        self.idle_max = idle_max
+
+        self.idle_delay = None
+
+    def next_delay(self, status, progress=None, duration=None):
+        """
+        Args:
+            status (String): The Spotify status -> playing, paused, stopped
+            progress (float): How far through the song the user is, in seconds
+            duration (float): How long the song is, in seconds
+
+        Returns:
+            float: Seconds to wait before the next poll
+        """
+
+        if (status == "playing" and progress is not None and duration):
+            self.idle_delay = None
+
+            remaining = duration - progress
+            return min(max(remaining + self.end_offset, self.min_interval), self.max_interval)
+
+        # Paused or stopped, back off exponentially
+        if (self.idle_delay is None):
+            self.idle_delay = self.idle_min
+        else:
+            self.idle_delay = min(self.idle_delay * 2, self.idle_max)
+
+        return self.idle_delay
+
+    def reset(self):
+        self.idle_delay = None
@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+from classes.octoprint import OctoPrintAPI, PrinterSnapshot
+
+
+class RegisteredPrinter(NamedTuple):
+    name: str
+    api: OctoPrintAPI
+
+
+class PrinterRegistry:
+    """
+    The OctoPrint servers to monitor, polled concurrently on a shared thread pool.
+
+    Each poll waits at most poll_timeout seconds. A printer that hasn't answered by then is shown
+    with its last snapshot and isn't polled again until its request finishes, so one slow or
+    offline host never delays the others.
+    """
+
+    DISPLAY_MODES = ("slowest", "rotate")
+
+    def __init__(self, output, printers, display_mode="slowest", poll_timeout=3, max_workers=8):
+        """
+        Args:
+            output (Output): Output class
+            printers (list): RegisteredPrinter for each OctoPrint server
+            display_mode (String): 'slowest' shows the job with the most time left, 'rotate' shows each active job in turn
+            poll_timeout (float): Longest a poll waits for the printers to answer
+            max_workers (int): Most printers polled at the same time
+        """
+        if (display_mode not in self.DISPLAY_MODES):
+            raise ValueError(f"Unknown printer display mode '{display_mode}', expected one of {', '.join(self.DISPLAY_MODES)}")
+
+        names = [printer.name for printer in printers]
+        if (len(set(names)) != len(names)):
+            raise ValueError("Each printer needs a unique name")
+
+        self.output = output
+        self.printers = list(printers)
+        self.display_mode = display_mode
+        self.poll_timeout = poll_timeout
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.printers))),
+                                           thread_name_prefix="PrinterPoll")
+        self.pending = {}
+        self.last_snapshots = {printer.name: PrinterSnapshot() for printer in self.printers}
+        self.rotation = -1
+
+        self.last_poll_latency = 0.0
+
+    @classmethod
+    def load(cls, output, path, **kwargs):
+        """
+        Loads the printers from a JSON config file, E.g.
+            {"display": "slowest",
+             "printers": [{"name": "Prusa", "host": "octopi.local", "port": 80},
+                          {"name": "Ender", "host": "ender.local", "api_key_env": "ENDER_API_KEY"}]}
+
+        The API key of each printer is read from the environment variable named by api_key_env, API_KEY by default.
+
+        Raises:
+            ValueError: Raised if the config has no printers or a printer has no host
+        """
+        # Loads the enviroment variables (api keys)
+        load_dotenv()
+        
+        with open(path, "r") as config_file:
+            config = json.load(config_file)
+
+        printers = []
+        for index, printer in enumerate(config.get("printers", [])):
+            if ("host" not in printer):
+                raise ValueError(f"Printer {index + 1} in '{path}' has no host")
+
+            api = OctoPrintAPI(printer["host"], printer.get("port", 80),
+                               api_key=os.getenv(printer.get("api_key_env", "API_KEY")), output=output, **kwargs)
+            printers.append(RegisteredPrinter(printer.get("name", printer["host"]), api))
+
+        if (not printers):
+            raise ValueError(f"No printers in '{path}'")
+
+        return cls(output, printers, display_mode=config.get("display", "slowest"))
+
+    def poll(self):
+        """
+        Gets a snapshot of every printer at the same time
+
+        Returns:
+            list: (name, PrinterSnapshot) of each printer, in the registry's order
+        """
+        start = time.monotonic()
+
+        for printer in self.printers:
+            # A printer still answering the last poll isn't asked again
+            if (printer.name not in self.pending):
+                self.pending[printer.name] = self.executor.submit(printer.api.get_snapshot)
+
+        done, _ = wait(list(self.pending.values()), timeout=self.poll_timeout)
+
+        for name, future in list(self.pending.items()):
+            if (future in done):
+                del self.pending[name]
+                try:
+                    self.last_snapshots[name] = future.result()
+                except Exception as Ex:
+                    self.output.out(f"Unable to poll '{name}'!\n{Ex}", "Printer Registry", status="warning")
+                    self.last_snapshots[name] = PrinterSnapshot(fetched_at=time.monotonic())
+            else:
+                self.output.debug("'%s' is slow to answer, showing its last snapshot", "Printer Registry", name)
+
+        self.last_poll_latency = time.monotonic() - start
+
+        return [(printer.name, self.last_snapshots[printer.name]) for printer in self.printers]
+
+    def select(self, snapshots):
+        """
+        Picks the job to show on the display
+
+        Args:
+            snapshots (list): (name, PrinterSnapshot) of each printer, from poll
+
+        Returns:
+            tuple: The name and snapshot of the printer to show, (None, None) if nothing is printing
+        """
+        active = [(name, snapshot) for name, snapshot in snapshots
+                  if snapshot.operational and snapshot.state and snapshot.state.lower().startswith("printing")]
+
+        if (not active):
+            return None, None
+
+        if (self.display_mode == "rotate"):
+            self.rotation = (self.rotation + 1) % len(active)
+            return active[self.rotation]
+
+        # The job that will finish last, or the least complete if OctoPrint has no estimate yet
+        return max(active, key=lambda item: (item[1].print_time_left or 0, -(item[1].progress or 0)))
+
+    def shutdown(self):
+        """
+        Stops the thread pool, polls that haven't started are cancelled. The pool's threads aren't daemons,
+        so a request already in flight still finishes within its OctoPrintAPI timeout before the program exits.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending = {}
+
+    # --- Getters --- #
+    def get_printers(self):
+        return self.printers
+
+    def get_last_poll_latency(self) -> float:
+        return self.last_poll_latency
+
+    def get_request_count(self) -> int:
+        return sum(printer.api.get_request_count() for printer in self.printers)
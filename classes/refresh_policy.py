@@ -0,0 +1,82 @@
+import time
+
+
+class RefreshPolicy:
+    """
+    Decides how the display should be refreshed based on which layout regions have changed.
+
+    Changes to a major region (the song title or artist) always refresh the display.
+    Changes that only affect minor regions (the clock strip or the progress bar) are held back
+    until minor_interval seconds have passed since the last refresh.
+    minor_interval needs to be shorter than the main loop's periodic redraw (RefreshTimer's max_wait),
+    otherwise clock-only redraws are skipped and the clock goes stale.
+    Partial refreshes leave ghosting behind, so after max_partial partial refreshes in a row the
+    next refresh is always a full one.
+    """
+
+    FULL = "full"
+    PARTIAL = "partial"
+    SKIP = "skip"
+
+    def __init__(self, major_regions=("title", "artist"), minor_interval=90, max_partial=10):
+        self.major_regions = set(major_regions)
+        self.minor_interval = minor_interval
+        self.max_partial = max_partial
+
+        self.last_refresh = None
+        self.partial_count = 0
+
+    def decide(self, dirty_regions, supports_partial=False):
+        """
+        Works out how the display should be refreshed
+
+        Args:
+            dirty_regions (set): Names of the regions that have changed since the last refresh
+            supports_partial (Boolean): If the display can refresh only part of the panel
+
+        Returns:
+            String: RefreshPolicy.FULL, RefreshPolicy.PARTIAL or RefreshPolicy.SKIP
+        """
+
+        if (not dirty_regions):
+            return self.SKIP
+
+        # Nothing has been pushed yet so there is nothing to partially update
+        if (self.last_refresh is None):
+            return self.FULL
+
+        if (supports_partial):
+            if (self.partial_count >= self.max_partial):
+                return self.FULL
+            return self.PARTIAL
+
+        if (dirty_regions & self.major_regions):
+            return self.FULL
+
+        if (time.monotonic() - self.last_refresh >= self.minor_interval):
+            return self.FULL
+
+        return self.SKIP
+
+    def refreshed(self, mode, started_at=None):
+        """
+        Records that the display has been refreshed
+
+        Args:
+            mode (String): RefreshPolicy.FULL or RefreshPolicy.PARTIAL
+            started_at (float): Monotonic time the refresh started, now if not given.
+                Timing from the start keeps a slow e-ink refresh from eating into minor_interval
+        """
+        self.last_refresh = time.monotonic() if started_at is None else started_at
+
+        if (mode == self.PARTIAL):
+            self.partial_count += 1
+        else:
+            self.partial_count = 0
+
+    def reset(self):
+        """
+        Forgets the last refresh, so the next frame is always fully refreshed
+        """
+        self.last_refresh = None
+        self.partial_count = 0
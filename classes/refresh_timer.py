@@ -1,38 +1,44 @@
-import datetime
 import time
 
 
 class RefreshTimer:
+    """
+    Tracks the time since the display was last refreshed on the monotonic clock,
+    the main loop schedules its next wake-up from the deadlines this gives
+    """
+
     def __init__(self, output, watchdog, minimum_wait=15, maximum_wait=120):
         self.output = output
         self.watchdog = watchdog
         self.minimum_wait = minimum_wait
         self.maximum_wait = maximum_wait
-        self.seconds_waited = 0
-        
-    def refresh_timer_loop(self, refresh_delay=5):
-        self.output.debug("Starting Refresh Timer", "Refresh Timer")
-        while (True):
-            self.watchdog.check_in("RefreshTimer")
-            self.seconds_waited += refresh_delay
-            
-            time.sleep(refresh_delay)
+        self.last_refresh = time.monotonic()
 
     # --- Getters and Setters --- #
     # --- Seconds waited --- #
     def is_refresh_ready(self) -> bool:
         # return self.seconds_waited >= self.minimum_wait
-        return self.seconds_waited >= (self.minimum_wait + 5)
-    
+        return self.get_seconds_waited() >= self.get_ready_wait()
+
     def reset_seconds_waited(self):
-        self.seconds_waited = 0
+        self.last_refresh = time.monotonic()
+
+    def get_seconds_waited(self) -> float:
+        return time.monotonic() - self.last_refresh
 
-    def get_seconds_waited(self) -> int:
-        return self.seconds_waited
+    def get_seconds_until(self, seconds) -> float:
+        """
+        Returns:
+            float: Seconds until the given number of seconds will have been waited, 0 if they already have
+        """
+        return max(seconds - self.get_seconds_waited(), 0)
 
     # --- Get minimum seconds waited --- #
+    def get_ready_wait(self):
+        return self.minimum_wait + 5
+
     def get_min_wait(self):
-        return self.minimum_wait 
-    
+        return self.minimum_wait
+
     def get_max_wait(self):
-        return self.maximum_wait               
\ No newline at end of file
+        return self.maximum_wait
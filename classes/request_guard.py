@@ -0,0 +1,280 @@
+import random
+import threading
+import time
+
+
+class RequestBlockedError(RuntimeError):
+    """
+    Raised instead of making a request while the guard is rate limited or its circuit breaker is open
+    """
+
+    def __init__(self, message, retry_in):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed buckets (in seconds)
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bucket in enumerate(self.buckets):
+            if (value <= bucket):
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.count += 1
+        self.sum += value
+
+    def get_cumulative_counts(self):
+        """
+        Returns:
+            list: (upper bound, count of values <= upper bound) for each bucket, ending with infinity
+        """
+        cumulative = []
+        total = 0
+        for bucket, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative.append((bucket, total))
+
+        return cumulative
+
+    def get_mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold failures in a row, blocking requests for reset_timeout seconds.
+    After that one trial request is let through, if it succeeds the circuit closes again,
+    if it fails the circuit re-opens for twice as long (up to max_reset_timeout).
+    Other callers are told to wait trial_wait seconds while the trial request is in flight.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, max_reset_timeout=600, trial_wait=1):
+        self.failure_threshold = failure_threshold
+        self.initial_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.trial_wait = trial_wait
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.trial_in_flight = False
+
+    def allow_request(self):
+        """
+        Called under the request guard's lock, a 0 while half-open lets that caller make the trial request
+
+        Returns:
+            float: 0 if a request can be made, otherwise the seconds until one can
+        """
+        if (self.state == self.OPEN):
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if (remaining > 0):
+                return remaining
+
+            self.state = self.HALF_OPEN
+
+        if (self.state == self.HALF_OPEN):
+            if (self.trial_in_flight):
+                return self.trial_wait
+
+            self.trial_in_flight = True
+
+        return 0
+
+    def retry_in(self):
+        """
+        Peeks at the wait without changing the state or taking the half-open trial
+
+        Returns:
+            float: 0 if a request could be made now, otherwise the seconds until one can
+        """
+        if (self.state == self.OPEN):
+            return max(self.opened_at + self.reset_timeout - time.monotonic(), 0)
+
+        if (self.state == self.HALF_OPEN and self.trial_in_flight):
+            return self.trial_wait
+
+        return 0
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.reset_timeout = self.initial_reset_timeout
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+
+        if (self.state == self.HALF_OPEN):
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            self.open()
+        elif (self.failures >= self.failure_threshold):
+            self.open()
+
+    def open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def get_state(self):
+        return self.state
+
+
+class RequestGuard:
+    """
+    Wraps calls to an API so they honour Retry-After, back off with jitter after errors and stop
+    altogether while the circuit breaker is open.
+    Latency and error counts are recorded per endpoint.
+    """
+
+    def __init__(self, output=None, name="API", base_backoff=1, max_backoff=300, circuit_breaker=None):
+        self.output = output
+        self.name = name
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+
+        self.lock = threading.Lock()
+        self.retry_at = 0.0
+        self.consecutive_errors = 0
+
+        self.latency = {}
+        self.requests = {}
+        self.errors = {}
+        self.rate_limited = 0
+        self.blocked = 0
+
+    def call(self, endpoint, function, *args, **kwargs):
+        """
+        Makes the request, unless it is rate limited or the circuit breaker is open
+
+        Args:
+            endpoint (String): Name the stats are recorded under
+            function (function): Makes the request
+
+        Raises:
+            RequestBlockedError: Raised without making a request while rate limited or the circuit is open
+        """
+        with self.lock:
+            wait = max(self.retry_at - time.monotonic(), self.circuit_breaker.allow_request())
+
+            if (wait > 0):
+                self.blocked += 1
+                raise RequestBlockedError(f"{self.name} requests paused ({self.circuit_breaker.get_state()} circuit)", wait)
+
+        start = time.monotonic()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as Ex:
+            self.record(endpoint, time.monotonic() - start, Ex)
+            raise
+        else:
+            self.record(endpoint, time.monotonic() - start)
+
+        return result
+
+    def record(self, endpoint, latency, error=None):
+        with self.lock:
+            self.latency.setdefault(endpoint, LatencyHistogram()).observe(latency)
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+            if (error is None):
+                self.consecutive_errors = 0
+                self.circuit_breaker.record_success()
+                return
+
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            retry_after = get_retry_after(error)
+
+            if (retry_after is not None):
+                # Rate limited, the server says how long to wait so it doesn't count towards the breaker
+                self.rate_limited += 1
+                delay = retry_after
+
+                # A rate limited trial request says nothing about the server, the next caller makes the trial
+                self.circuit_breaker.trial_in_flight = False
+            else:
+                self.consecutive_errors += 1
+                self.circuit_breaker.record_failure()
+
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** self.consecutive_errors))
+
+            self.retry_at = max(self.retry_at, time.monotonic() + delay)
+
+        if (self.output is not None):
+            self.output.debug("%s failed, retrying in %.1fs: %s", self.name, endpoint, delay, error)
+
+    def get_retry_delay(self):
+        """
+        Returns:
+            float: Seconds until the next request is allowed, without taking the circuit breaker's trial request
+        """
+        with self.lock:
+            return max(self.retry_at - time.monotonic(), self.circuit_breaker.retry_in(), 0)
+
+    # --- Stats --- #
+    def get_latency(self):
+        return self.latency
+
+    def get_requests(self):
+        return self.requests
+
+    def get_errors(self):
+        return self.errors
+
+    def get_rate_limited(self):
+        return self.rate_limited
+
+    def get_blocked(self):
+        return self.blocked
+
+
+def get_retry_after(error):
+    """
+    Gets the Retry-After value from a 429 or 503 error
+
+    Returns:
+        float: Seconds to wait, or None if the error isn't a rate limit. Errors without a Retry-After header,
+            E.g. spotipy's 429 after urllib3 has run out of 5xx retries, aren't treated as a rate limit
+    """
+    status = getattr(error, "http_status", None)
+    headers = getattr(error, "headers", None)
+
+    response = getattr(error, "response", None)
+    if (status is None and response is not None):
+        status = response.status_code
+        headers = response.headers
+
+    if (status not in (429, 503) or not headers):
+        return None
+
+    retry_after = headers.get("Retry-After", headers.get("retry-after"))
+    if (retry_after is None):
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -1,9 +1,33 @@
-
 import os
+import threading
+import time
+from typing import NamedTuple
 from dotenv import load_dotenv
 
+import requests
 import spotipy
+from requests.adapters import HTTPAdapter
+from spotipy.cache_handler import CacheFileHandler, CacheHandler
 from spotipy.oauth2 import SpotifyOAuth
+from urllib3.util.retry import Retry
+
+from classes.request_guard import RequestGuard
+from classes.state_store import StateStore
+
+
+class NowPlaying(NamedTuple):
+    """
+    An immutable snapshot of what Spotify is playing
+    """
+    status: str                     # playing, paused or stopped
+    song_id: str = None
+    song_name: str = None
+    artist_name: str = None
+    explicit: bool = False
+    progress: float = None          # How far through the song the user is, in seconds
+    duration: float = None          # How long the song is, in seconds
+    album_id: str = None
+    album_art_url: str = None
 
 
 class SpotipyValues:
@@ -12,81 +36,73 @@ class SpotipyValues:
     """
     def __init__(self):
         
-        self.spotify_status = str
-        self.song_id = str
-        self.song_name = str
-        self.artist_name = str
-        self.explicit_song = bool
-        self.song_progress = None
-        self.song_duration = None
+        # What is playing, the version only changes when the song does
+        self.now_playing = StateStore(NowPlaying("stopped"))
         
         self.top_artists = []
     
-    # --- Getters and Setters --- #
-    # Status
-    def set_spotify_status(self, status):
-        self.spotify_status = status
-        
-    def get_spotify_status(self) -> str:
-        return self.spotify_status
-    
-    # Song ID
-    def set_song_id(self, song_id):
-        self.song_id = song_id
-        
-    def get_song_id(self) -> str:
-        return self.song_id
-
-    # Song Name
-    def set_song_name(self, song_name):
-        self.song_name = song_name
-        
-    def get_song_name(self) -> str:
-        return self.song_name
+    # --- Now Playing --- #
+    def publish(self, now_playing, changed=True):
+        """
+        Publishes a new snapshot
 
-    # Artist Name
-    def set_artist_name(self, artist_name):
-        self.artist_name = artist_name
-        
-    def get_artist_name(self) -> str:
-        return self.artist_name
+        Args:
+            now_playing (NowPlaying): The new snapshot
+            changed (Boolean): If the song has changed, only then is the version incremented
+        """
+        self.now_playing.publish(now_playing, changed)
+    
+    def get_snapshot(self):
+        """
+        Returns:
+            tuple: The version and the NowPlaying snapshot
+        """
+        return self.now_playing.get_snapshot()
     
+    def get_now_playing(self) -> NowPlaying:
+        return self.now_playing.get()
+    
+    def get_version(self) -> int:
+        return self.now_playing.get_version()
+    
+    # --- Top Artists --- #
     def set_top_artists(self, top_artists):
         self.top_artists = top_artists
         
     def get_top_artists(self):
         return self.top_artists
-
-    # Explicit
-    def set_explicit_song(self, explicit_song):
-        self.explicit_song = explicit_song
-        
-    def get_explicit_song(self) -> bool:
-        return self.explicit_song
     
-    # Progress / Duration
-    def set_song_progress(self, song_progress):
-        self.song_progress = song_progress
-        
-    def get_song_progress(self):
-        """Returns the progress of the current song
 
-        Returns:
-            int: Integer value of how far through the song the user is, in Seconds
-        """
-        return self.song_progress
-    
-    def set_song_duration(self, song_duration):
-        self.song_duration = song_duration
-        
-    def get_song_duration(self):
-        """Returns the duration of the song being listened to
 
-        Returns:
-            int: Integer value of the length of the current song, in Seconds
-        """
-        return self.song_duration
-    
+class MemoryTokenCache(CacheHandler):
+    """
+    Keeps the OAuth token in memory so it isn't read from disk on every request.
+    The cache file is only read the first time the token is needed and written when the token changes.
+    """
+
+    def __init__(self, cache_path=None):
+        self.file_cache = CacheFileHandler(cache_path=cache_path)
+        self.lock = threading.Lock()
+
+        self.token_info = None
+        self.loaded = False
+        self.saves = 0
+
+    def get_cached_token(self):
+        with self.lock:
+            if (not self.loaded):
+                self.token_info = self.file_cache.get_cached_token()
+                self.loaded = True
+
+            return self.token_info
+
+    def save_token_to_cache(self, token_info):
+        with self.lock:
+            self.token_info = token_info
+            self.loaded = True
+            self.saves += 1
+
+        self.file_cache.save_token_to_cache(token_info)
 
 
 class SpotipyAPI:
@@ -94,33 +110,129 @@ class SpotipyAPI:
     This Class is an interface for the Spotify API
     """
 
-    def __init__(self):
+    def __init__(self, output=None):
         # Loads the enviroment variables
         load_dotenv()
 
+        self.output = output
+
         self.client_id = os.getenv("CLIENT_ID")
         self.client_secret = os.getenv("CLIENT_SECRET")
         self.SPOTIFY_REDIRECT_URI = "http://localhost:8080"
 
         self.scope = "user-read-currently-playing", "user-top-read"
 
+        # Refresh the token this many seconds before it expires
+        self.TOKEN_REFRESH_MARGIN = 120
+
+        # One keep-alive session shared by the client and the token requests
+        # 429s and 503s aren't retried or slept on here, the request guard waits for their Retry-After instead
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4,
+                                                   max_retries=Retry(total=3,
+                                                                     backoff_factor=0.3,
+                                                                     status_forcelist=(500, 502, 504),
+                                                                     respect_retry_after_header=False,
+                                                                     allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]))))
+
+        self.token_cache = MemoryTokenCache()
+        self.auth_manager = SpotifyOAuth(client_id=self.client_id,
+                                         client_secret=self.client_secret,
+                                         redirect_uri=self.SPOTIFY_REDIRECT_URI,
+                                         scope=self.scope,
+                                         open_browser=True,
+                                         cache_handler=self.token_cache,
+                                         requests_session=self.session)
+        self.client = spotipy.Spotify(auth_manager=self.auth_manager, requests_session=self.session)
+
+        # Rate limit, backoff and circuit breaker handling for every Spotify request
+        self.request_guard = RequestGuard(output, name="Spotipy API")
+
+        self.created = time.monotonic()
+        self.token_refresher = None
+        self.exit_flag = threading.Event()
+        
+        # Album images smaller than this are only used if there isn't a bigger one
+        self.ALBUM_ART_MIN_WIDTH = 100
+
 
     def get_spotify_data(self):
         """
-        Makes an API call and gets the spotify date
+        Gets the Spotify client, the same client and connection pool is used for every call
+
+        Returns:
+            spotipy.Spotify: The Spotify client
+        """
+
+        return self.client
+
+
+    def load_token(self):
+        """
+        Loads the OAuth token from the cache, refreshing it if it has expired.
+
+        Returns:
+            String: The access token
+        """
 
+        return self.auth_manager.get_access_token(as_dict=False)
+
+
+    def start_token_refresher(self):
+        """
+        Starts a thread that refreshes the token before it expires, so requests never wait for a refresh
+        """
+
+        self.token_refresher = threading.Thread(target=self.token_refresh_loop, name="TokenRefresher")
+        self.token_refresher.daemon = True
+        self.token_refresher.start()
+
+
+    def token_refresh_loop(self):
+        while (not self.exit_flag.is_set()):
+            token_info = self.token_cache.get_cached_token()
+
+            if (token_info is None):
+                # Nothing to refresh until the first token has been loaded
+                self.exit_flag.wait(60)
+                continue
+
+            refresh_in = token_info["expires_at"] - self.TOKEN_REFRESH_MARGIN - time.time()
+            if (refresh_in > 0):
+                self.exit_flag.wait(refresh_in)
+                continue
+
+            try:
+                self.request_guard.call("token_refresh", self.auth_manager.refresh_access_token, token_info["refresh_token"])
+            except Exception as Ex:
+                if (self.output is not None):
+                    self.output.out(f"Unable to refresh the Spotify token!\n{Ex}", "Spotipy API", status="warning")
+                self.exit_flag.wait(30)
+            else:
+                if (self.output is not None):
+                    self.output.debug("Refreshed the Spotify token", "Spotipy API")
+
+
+    # --- Connection stats --- #
+    def get_connection_count(self) -> int:
+        """
         Returns:
-            String: Returns the json response from the call
+            int: The number of HTTP connections opened by the connection pool
         """
+        pool_manager = self.session.get_adapter("https://").poolmanager
+        return sum(pool_manager.pools[key].num_connections for key in pool_manager.pools.keys())
+
+    def get_request_guard(self):
+        return self.request_guard
 
-        spotify_data = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=self.client_id,
-                                                                 client_secret=self.client_secret,
-                                                                 redirect_uri=self.SPOTIFY_REDIRECT_URI,
-                                                                 scope=self.scope,
-                                                                 open_browser=True))
+    def get_token_refresh_count(self) -> int:
+        return self.token_cache.saves
 
-        #return spotify_data.current_user_playing_track()
-        return spotify_data
+    def get_connections_per_hour(self) -> float:
+        return self.get_connection_count() / max((time.monotonic() - self.created) / 3600, 1 / 60)
+
+    def get_token_refreshes_per_hour(self) -> float:
+        return self.get_token_refresh_count() / max((time.monotonic() - self.created) / 3600, 1 / 60)
 
 
     def get_currently_playing(self):
@@ -128,17 +240,9 @@ class SpotipyAPI:
         Calls the Spotify API and returns the 
 
         Returns:
-            tuple: Returns an array of values depending on the result of the API call
-                spotify_status: The status of Spotify -> playing, paused, stopped
-                id: The id of the song currently playing
-                song_name: The name of the song currently playing
-                artist_name: The name of the songs artist(s)
-                explicit: A boolean value showing if a song is explicit or not
-                progress: How far through the song the user is (in miliseconds)
-                duration: How long the song is (in miliseconds)
+            NowPlaying: A snapshot of what is playing, only the status is set if nothing is playing
         """
-        spotify_data = self.get_spotify_data()
-        spotify_data = spotify_data.current_user_playing_track()
+        spotify_data = self.request_guard.call("currently_playing", self.get_spotify_data().current_user_playing_track)
 
         if (type(spotify_data) is dict):
             # Get song name
@@ -159,11 +263,28 @@ class SpotipyAPI:
             # Moved in-line with the return
             #artist_name = artist_name[:len(artist_name) - 2]
 
-            return status, spotify_data['item']['id'], song_name, artist_name[:len(artist_name) - 2], spotify_data['item']['explicit'], spotify_data['progress_ms'], spotify_data['item']['duration_ms']
+            # Get the smallest album image that is still big enough for the display
+            album = spotify_data['item'].get('album') or {}
+            album_images = sorted(album.get('images') or [], key=lambda image: image.get('width') or 0)
+            album_art_url = None
+            for image in album_images:
+                album_art_url = image['url']
+                if ((image.get('width') or 0) >= self.ALBUM_ART_MIN_WIDTH):
+                    break
+
+            return NowPlaying(status=status,
+                              song_id=spotify_data['item']['id'],
+                              song_name=song_name,
+                              artist_name=artist_name[:len(artist_name) - 2],
+                              explicit=spotify_data['item']['explicit'],
+                              progress=spotify_data['progress_ms'] / 1000,
+                              duration=spotify_data['item']['duration_ms'] / 1000,
+                              album_id=album.get('id'),
+                              album_art_url=album_art_url)
 
         else:
 
-            return "stopped", "Paused", "------------"
+            return NowPlaying("stopped", "Paused", "------------")
 
 
     def get_top_artists(self):
@@ -177,7 +298,7 @@ class SpotipyAPI:
         spotify_data = self.get_spotify_data()
 
         #top_artists = spotify_data.current_user_top_artists(limit=10, offset=0, time_range='medium_term')['items']
-        top_artists = spotify_data.current_user_top_artists(limit=10, offset=0, time_range='medium_term')['items']
+        top_artists = self.request_guard.call("top_artists", spotify_data.current_user_top_artists, limit=10, offset=0, time_range='medium_term')['items']
         
         top_artists_list = []
         for i in range(len(top_artists)):
@@ -0,0 +1,162 @@
+import collections
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Times the stages of the main loop, the Spotify loop and the display updates.
+
+    The last window durations of each stage are kept, so the p50, p95 and max are of recent passes
+    rather than the whole run. Spans can be nested, E.g. 'display.show' inside 'display.update_song'.
+
+    If profiling is enabled each outermost span on a thread is also run under cProfile, giving
+    a per-stage profile of where the time inside it went. From Python 3.12 cProfile uses the
+    process-wide sys.monitoring profiler slot, so a span that starts while another thread's span is
+    being profiled is timed but not profiled.
+    """
+
+    def __init__(self, window=256, profile=False):
+        """
+        Args:
+            window (int): Number of recent durations kept for each stage
+            profile (Boolean): Run each outermost span under cProfile
+        """
+        self.window = window
+        self.profile = profile
+
+        self.durations = {}
+        self.counts = {}
+        self.totals = {}
+        self.lock = threading.Lock()
+
+        # Only one profiler can be enabled per thread (per process from Python 3.12), so nested spans aren't profiled
+        self.profiles = {}
+        self.local = threading.local()
+
+    @contextmanager
+    def span(self, name):
+        """
+        Times the code inside the with block as a stage
+
+        Args:
+            name (String): Name of the stage
+        """
+        profiler = self.start_profile(name) if self.profile else None
+        span_start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - span_start
+
+            if (profiler is not None):
+                profiler.disable()
+                self.local.profiling = False
+
+            self.record(name, duration)
+
+    def record(self, name, duration):
+        durations = self.durations.get(name)
+        if (durations is None):
+            with self.lock:
+                durations = self.durations.setdefault(name, collections.deque(maxlen=self.window))
+                self.counts.setdefault(name, 0)
+                self.totals.setdefault(name, 0.0)
+
+        durations.append(duration)
+        self.counts[name] += 1
+        self.totals[name] += duration
+
+    def start_profile(self, name):
+        """
+        Returns:
+            cProfile.Profile: The enabled profiler of this stage on this thread, None if another profiler is already active
+        """
+        if (getattr(self.local, "profiling", False)):
+            return None
+
+        key = (name, threading.current_thread().name)
+        profiler = self.profiles.get(key)
+        if (profiler is None):
+            with self.lock:
+                profiler = self.profiles.setdefault(key, cProfile.Profile())
+
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another thread's span holds the profiler slot, this span is only timed
+            return None
+
+        self.local.profiling = True
+        return profiler
+
+    def get_stats(self, name):
+        """
+        Returns:
+            tuple: The count, p50, p95 and max of the stage's recent durations in seconds
+        """
+        durations = sorted(self.durations.get(name, ()))
+        if (not durations):
+            return 0, 0.0, 0.0, 0.0
+
+        def percentile(fraction):
+            return durations[min(int(len(durations) * fraction), len(durations) - 1)]
+
+        return self.counts[name], percentile(0.5), percentile(0.95), durations[-1]
+
+    def get_total(self, name) -> float:
+        """
+        Returns:
+            float: Seconds spent in the stage over the whole run
+        """
+        return self.totals.get(name, 0.0)
+
+    def get_stages(self):
+        with self.lock:
+            return sorted(self.durations)
+
+    def report(self, output):
+        """
+        Outputs the count, p50, p95 and max of each stage
+        """
+        output.out(f"{'Stage':<32} {'Count':>7} {'p50':>9} {'p95':>9} {'Max':>9}", "Stage Timer")
+        for name in self.get_stages():
+            count, p50, p95, maximum = self.get_stats(name)
+            output.out(f"{name:<32} {count:>7} {p50 * 1000:7.1f}ms {p95 * 1000:7.1f}ms {maximum * 1000:7.1f}ms", "Stage Timer")
+
+    def write_profile(self, path, limit=20):
+        """
+        Writes the stage timings and the functions each profiled stage spent the most time in
+
+        Args:
+            path (String): File the report is written to
+            limit (int): Number of functions listed for each stage
+        """
+        with self.lock:
+            profiles = dict(self.profiles)
+
+        stages = {}
+        for (name, _), profiler in profiles.items():
+            stages.setdefault(name, []).append(profiler)
+
+        with open(path, "w") as report_file:
+            report_file.write(f"{'Stage':<32} {'Count':>7} {'p50':>9} {'p95':>9} {'Max':>9}\n")
+            for name in self.get_stages():
+                count, p50, p95, maximum = self.get_stats(name)
+                report_file.write(f"{name:<32} {count:>7} {p50 * 1000:7.1f}ms {p95 * 1000:7.1f}ms {maximum * 1000:7.1f}ms\n")
+
+            for name in sorted(stages):
+                stream = io.StringIO()
+                try:
+                    stats = pstats.Stats(*stages[name], stream=stream)
+                except TypeError:
+                    # A profiler that never ran has no stats
+                    continue
+
+                stats.sort_stats("cumulative").print_stats(limit)
+                report_file.write(f"\n{'=' * 80}\n{name}\n{'=' * 80}\n{stream.getvalue()}")
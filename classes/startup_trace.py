@@ -0,0 +1,51 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTrace:
+    """
+    Records how long each stage of the start-up takes and which thread it ran on
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the code inside the with block as a start-up stage
+
+        Args:
+            name (String): Name of the stage
+        """
+        stage_start = time.monotonic()
+        # The duration stays None while the stage is still running
+        record = [name, threading.current_thread().name, stage_start - self.start, None]
+
+        with self.lock:
+            self.stages.append(record)
+
+        try:
+            yield
+        finally:
+            record[3] = time.monotonic() - stage_start
+
+    def get_elapsed(self):
+        return time.monotonic() - self.start
+
+    def report(self, output):
+        """
+        Outputs each stage in the order they started with their start offset and duration
+        """
+        with self.lock:
+            stages = sorted((list(stage) for stage in self.stages), key=lambda stage: stage[2])
+
+        output.out(f"{'Stage':<22} {'Thread':<20} {'Start':>8} {'Duration':>9}", "Startup Trace")
+        for name, thread_name, offset, duration in stages:
+            duration = f"{duration:8.2f}s" if duration is not None else "  running"
+            output.out(f"{name:<22} {thread_name[:20]:<20} {offset:7.2f}s {duration}", "Startup Trace")
+
+        output.out(f"Start-up took {self.get_elapsed():.2f}s", "Startup Trace")
@@ -0,0 +1,68 @@
+import threading
+
+
+class StateStore:
+    """
+    Holds an immutable value with a version that increases every time a changed value is published.
+
+    The version and value are replaced together as one tuple, so readers never need a lock and can
+    never see half an update, E.g. a new song id with the old duration.
+    Writers copy the value and replace the tuple under the lock. Readers compare the version with the
+    one they last used to tell if anything has changed, the main loop is woken for a new version by the
+    DeadlineScheduler rather than by waiting on the store.
+    """
+
+    def __init__(self, value):
+        """
+        Args:
+            value: The initial value, at version 0. Should be immutable, E.g. a NamedTuple
+        """
+        self.lock = threading.RLock()
+        self.snapshot = (0, value)
+
+        self.publishes = 0
+
+    def publish(self, value, changed=True):
+        """
+        Replaces the value
+
+        Args:
+            value: The new value
+            changed (Boolean): Only then is the version incremented
+
+        Returns:
+            int: The version of the value
+        """
+        with self.lock:
+            version = self.snapshot[0] + 1 if changed else self.snapshot[0]
+            self.snapshot = (version, value)
+            self.publishes += 1
+
+        return version
+
+    def update(self, changed=True, **fields):
+        """
+        Publishes a copy of the current value with the given fields replaced, the value must be a NamedTuple
+
+        Returns:
+            int: The version of the value
+        """
+        with self.lock:
+            return self.publish(self.snapshot[1]._replace(**fields), changed)
+
+    # --- Getters --- #
+    def get_snapshot(self):
+        """
+        Returns:
+            tuple: The version and value
+        """
+        return self.snapshot
+
+    def get(self):
+        return self.snapshot[1]
+
+    def get_version(self) -> int:
+        return self.snapshot[0]
+
+    def get_publishes(self) -> int:
+        return self.publishes
@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+
+
+class TextMetrics:
+    """
+    A bounded LRU cache of text sizes keyed by (font, text), shared by ProgramLogic and Display
+    so the same string is only ever measured by the font rasterizer once.
+
+    Per-glyph advance widths are also kept for each font so the width of every prefix of a
+    string can be estimated with prefix sums instead of measuring each prefix.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+
+        self.sizes = OrderedDict()
+        self.advances = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def getsize(self, font, text):
+        """
+        Gets the size of the text in the given font
+
+        Returns:
+            tuple: The width and height of the text in pixels
+        """
+        key = (font, text)
+
+        with self.lock:
+            size = self.sizes.get(key)
+
+            if (size is not None):
+                self.sizes.move_to_end(key)
+                self.hits += 1
+                return size
+
+            self.misses += 1
+
+        size = font.getsize(text)
+
+        with self.lock:
+            self.sizes[key] = size
+            if (len(self.sizes) > self.maxsize):
+                self.sizes.popitem(last=False)
+
+        return size
+
+    def get_width(self, font, text):
+        return self.getsize(font, text)[0]
+
+    def prefix_widths(self, font, text):
+        """
+        Estimates the width of every prefix of the text from the glyph advance table.
+        Kerning is ignored, so the values should be checked with getsize() before being relied on.
+
+        Returns:
+            list: prefix_widths[i] is the estimated width of text[:i]
+        """
+        with self.lock:
+            glyphs = self.advances.setdefault(font, {})
+
+        widths = [0]
+        for char in text:
+            advance = glyphs.get(char)
+            if (advance is None):
+                advance = glyphs[char] = font.getsize(char)[0]
+            widths.append(widths[-1] + advance)
+
+        return widths
+
+    # --- Stats --- #
+    def get_hits(self):
+        return self.hits
+
+    def get_misses(self):
+        return self.misses
+
+    def get_hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.sizes.clear()
+            self.advances.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,145 @@
+import os
+import time
+
+from PIL import Image
+
+
+class VirtualInky:
+    """
+    A virtual Inky panel with the same interface, resolution and palette as the Inky pHAT (red).
+
+    Each refresh writes the frame to the output directory as a PNG or as raw palette bytes and
+    records how long the refresh would have taken on the real panel.
+    """
+
+    WHITE = 0
+    BLACK = 1
+    RED = 2
+
+    # RGB values for WHITE, BLACK and RED
+    PALETTE = [255, 255, 255,
+               0, 0, 0,
+               255, 0, 0]
+
+    def __init__(self, output_dir="frames", image_format="png", resolution=(250, 122),
+                 refresh_latency=15.0, partial_latency=2.0, realtime=False, partial=False):
+        """
+        Args:
+            output_dir (String): Directory the frames are written to, None to not write frames
+            image_format (String): "png" or "raw"
+            resolution (tuple): Width and height of the panel
+            refresh_latency (float): Simulated time for a full refresh, in seconds
+            partial_latency (float): Simulated time for a partial refresh, in seconds
+            realtime (Boolean): Sleep for the simulated latency on each refresh
+            partial (Boolean): Expose show_partial() so Display can push only the changed regions
+        """
+
+        if (image_format not in ("png", "raw")):
+            raise ValueError(f"Unknown image format '{image_format}'")
+
+        self.WIDTH, self.HEIGHT = resolution
+        self.width, self.height = resolution
+        self.resolution = tuple(resolution)
+
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.refresh_latency = refresh_latency
+        self.partial_latency = partial_latency
+        self.realtime = realtime
+
+        if (not partial):
+            # Hide show_partial so the display is treated like the real Inky driver
+            self.show_partial = None
+
+        self.border = self.WHITE
+        self.buf = bytearray(self.WIDTH * self.HEIGHT)
+
+        self.frame_count = 0
+        self.refreshes = []
+
+        if (self.output_dir is not None):
+            os.makedirs(self.output_dir, exist_ok=True)
+
+    def set_border(self, colour):
+        self.border = colour
+
+    def set_image(self, image):
+        """
+        Stores the image in the panel buffer, converting it to the panel's palette if needed
+        """
+
+        if (image.mode != "P"):
+            palette_img = Image.new("P", (1, 1))
+            palette_img.putpalette(self.PALETTE + [0] * (768 - len(self.PALETTE)))
+            image = image.convert("RGB").quantize(palette=palette_img)
+
+        if (image.size != self.resolution):
+            canvas = Image.new("P", self.resolution, self.WHITE)
+            canvas.paste(image, (0, 0))
+            image = canvas
+
+        self.buf[:] = image.tobytes()
+
+    def show(self):
+        self.refresh("full", self.refresh_latency)
+
+    def show_partial(self, regions):
+        """
+        Args:
+            regions (list): (x0, y0, x1, y1) boxes that have changed
+        """
+        self.refresh("partial", self.partial_latency, regions)
+
+    def refresh(self, kind, latency, regions=None):
+        if (self.realtime):
+            time.sleep(latency)
+
+        path = self.write_frame()
+
+        self.refreshes.append({"time": time.time(),
+                               "kind": kind,
+                               "latency": latency,
+                               "regions": regions,
+                               "path": path})
+        self.frame_count += 1
+
+    def write_frame(self):
+        """
+        Writes the panel buffer to the output directory
+
+        Returns:
+            String: Path of the frame written, or None if frames aren't being written
+        """
+
+        if (self.output_dir is None):
+            return None
+
+        path = os.path.join(self.output_dir, f"frame_{self.frame_count:05d}_{self.WIDTH}x{self.HEIGHT}.{self.image_format}")
+
+        if (self.image_format == "raw"):
+            with open(path, "wb") as raw_file:
+                raw_file.write(self.buf)
+        else:
+            self.get_image().save(path)
+
+        return path
+
+    def get_image(self):
+        """
+        Returns:
+            Image: The panel buffer as a "P" mode Image with the panel's palette
+        """
+        image = Image.frombytes("P", self.resolution, bytes(self.buf))
+        image.putpalette(self.PALETTE)
+        return image
+
+    # --- Refresh stats --- #
+    def get_refresh_count(self):
+        return len(self.refreshes)
+
+    def get_simulated_latency(self):
+        """
+        Returns:
+            float: Total simulated refresh time, in seconds
+        """
+        return sum(refresh["latency"] for refresh in self.refreshes)
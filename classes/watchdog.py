@@ -12,6 +12,7 @@ class WatchDog:
         self.calling_class = {}
         self.timeout = timeout
         self.exit_flag = threading.Event()
+        self.thread = None
         
     
     def start(self, calling_class):
@@ -28,9 +29,9 @@ class WatchDog:
         
         try:
             self.output.watchdog_out("Starting WatchDog Thread...", blockPosition="start")
-            watchdog_thread = threading.Thread(target=self.watch_thread)
-            watchdog_thread.daemon = True
-            watchdog_thread.start()
+            self.thread = threading.Thread(target=self.watch_thread, name="WatchDog")
+            self.thread.daemon = True
+            self.thread.start()
         except Exception as Ex:
             self.output.watchdog_out("Failed to start WatchDog Thread!", blockPosition="end")
             self.exit_flag.set()
@@ -49,12 +50,16 @@ class WatchDog:
             calling_class (String): Identifier for the calling class to use to check in
         """
         
-        try:
-            self.output.watchdog_out(f"'{calling_class}' checking in after {str(time.time() - self.calling_class[calling_class])[:4]}s")
-        except KeyError:
-            self.output.watchdog_out(f"'{calling_class}' initialised WatchDog")
+        now = time.time()
+        last_check_in = self.calling_class.get(calling_class)
+        
+        # Logged lazily so nothing is formatted unless debugging
+        if (last_check_in is None):
+            self.output.watchdog_out("'%s' initialised WatchDog", calling_class)
+        else:
+            self.output.watchdog_out("'%s' checking in after %.2fs", calling_class, now - last_check_in)
             
-        self.calling_class[calling_class] = time.time()
+        self.calling_class[calling_class] = now
 
 
     def watch_thread(self):
@@ -71,4 +76,13 @@ class WatchDog:
                     self.exit_flag.set()  # Set the exit flag
                     break
                 
-            time.sleep(self.timeout)
\ No newline at end of file
+            time.sleep(self.timeout)
+
+
+    def get_check_in_ages(self):
+        """
+        Returns:
+            dict: Seconds since each area of code last checked in
+        """
+        now = time.time()
+        return {calling_class: now - last_check_in for calling_class, last_check_in in list(self.calling_class.items())}
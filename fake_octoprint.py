@@ -0,0 +1,201 @@
+# Other imports
+import argparse
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Key the websocket handshake is hashed with (RFC 6455)
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class FakePrint:
+    """
+    A print that loops from 0 to 100% over duration seconds, then idles for idle seconds
+    """
+
+    def __init__(self, duration=600, idle=30):
+        self.duration = duration
+        self.idle = idle
+        self.start = time.monotonic()
+
+    def get_state(self):
+        """
+        Returns:
+            dict: The state in the shape of OctoPrint's 'current' push message
+        """
+        elapsed = (time.monotonic() - self.start) % (self.duration + self.idle)
+        printing = elapsed < self.duration
+
+        if (printing):
+            progress = {"completion": elapsed / self.duration * 100, "printTime": int(elapsed),
+                        "printTimeLeft": int(self.duration - elapsed), "printTimeLeftOrigin": "estimate"}
+        else:
+            progress = {"completion": None, "printTime": None, "printTimeLeft": None, "printTimeLeftOrigin": None}
+
+        return {
+            "state": {"text": "Printing" if printing else "Operational",
+                      "flags": {"operational": True, "printing": printing, "paused": False, "error": False}},
+            "job": {"file": {"name": "benchy.gcode"}, "estimatedPrintTime": self.duration},
+            "progress": progress,
+            "currentZ": None,
+            "offsets": {},
+            "temps": [],
+            "logs": [],
+            "messages": [],
+        }
+
+
+class FakeOctoPrintHandler(BaseHTTPRequestHandler):
+    """
+    Serves /api/job, /api/login and the /sockjs/websocket push API
+    """
+
+    # Websocket clients reject a 101 response from HTTP/1.0
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if (self.path.startswith("/sockjs/websocket")):
+            self.push()
+        elif (self.path.startswith("/api/job")):
+            time.sleep(self.server.delay)
+            current = self.server.fake_print.get_state()
+            self.send_json({"state": current["state"]["text"], "job": current["job"], "progress": current["progress"]})
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self):
+        # Read the body so the next request on the connection starts in the right place
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if (self.path.startswith("/api/login")):
+            self.send_json({"name": "_api", "session": "fake-session", "active": True})
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def push(self):
+        """
+        Accepts the websocket and sends the 'connected', 'history' then 'current' messages every interval
+        """
+        key = self.headers.get("Sec-WebSocket-Key")
+        if (key is None):
+            self.send_json({"error": "Expected a websocket upgrade"}, 400)
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+
+        self.log_message("Push client connected")
+        connected_at = time.monotonic()
+
+        try:
+            self.send_frame({"connected": {"version": "1.9.3", "display_version": "1.9.3 (fake)"}})
+            self.send_frame({"history": self.server.fake_print.get_state()})
+
+            while (not self.server.stopped.wait(self.server.interval)):
+                if (self.server.drop_after and time.monotonic() - connected_at > self.server.drop_after):
+                    self.log_message("Dropping push client")
+                    break
+
+                self.send_frame({"current": self.server.fake_print.get_state()})
+        except OSError:
+            self.log_message("Push client disconnected")
+
+        self.close_connection = True
+
+    def send_frame(self, message):
+        """
+        Sends the message as an unmasked websocket text frame
+        """
+        data = json.dumps(message).encode("utf-8")
+
+        if (len(data) < 126):
+            header = struct.pack("!BB", 0x81, len(data))
+        elif (len(data) < 65536):
+            header = struct.pack("!BBH", 0x81, 126, len(data))
+        else:
+            header = struct.pack("!BBQ", 0x81, 127, len(data))
+
+        self.wfile.write(header + data)
+        self.wfile.flush()
+
+
+class FakeOctoPrint(ThreadingHTTPServer):
+    """
+    A stand-in OctoPrint server for running SpotiPi without a printer
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 5000), duration=600, idle=30, interval=1, drop_after=None, delay=0):
+        """
+        Args:
+            address (tuple): Host and port to listen on, port 0 picks a free port
+            duration (float): Seconds each fake print takes
+            idle (float): Seconds between fake prints
+            interval (float): Seconds between 'current' push messages
+            drop_after (float): Closes each push connection after this many seconds, to test reconnecting
+            delay (float): Seconds each /api/job request takes to answer, like a busy OctoPi
+        """
+        super().__init__(address, FakeOctoPrintHandler)
+        self.fake_print = FakePrint(duration, idle)
+        self.interval = interval
+        self.drop_after = drop_after
+        self.delay = delay
+        self.stopped = threading.Event()
+
+    def start(self):
+        """
+        Serves on a background thread
+
+        Returns:
+            int: The port being served on
+        """
+        thread = threading.Thread(target=self.serve_forever, name="FakeOctoPrint")
+        thread.daemon = True
+        thread.start()
+
+        return self.server_address[1]
+
+    def stop(self):
+        self.stopped.set()
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves a fake OctoPrint REST and push API")
+    parser.add_argument("--host", default="127.0.0.1", required=False)
+    parser.add_argument("--port", type=int, default=5000, required=False)
+    parser.add_argument("--duration", type=float, default=600, required=False, help="Seconds each fake print takes")
+    parser.add_argument("--interval", type=float, default=1, required=False, help="Seconds between push messages")
+    parser.add_argument("--drop-after", type=float, default=None, required=False,
+                        help="Close each push connection after this many seconds")
+    parser.add_argument("--delay", type=float, default=0, required=False, help="Seconds each /api/job request takes")
+
+    args = parser.parse_args()
+
+    server = FakeOctoPrint((args.host, args.port), duration=args.duration, interval=args.interval, drop_after=args.drop_after,
+                           delay=args.delay)
+    print(f"Fake OctoPrint listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stopped.set()
+        server.server_close()
@@ -1,22 +1,42 @@
 # Other imports
 import os
 import argparse
-import math
 import time
 import datetime
+import signal
 import threading
 
 import requests
 
 # Class Imports
-from classes import refresh_timer, octoprint, spotipy, watchdog, output
+from classes import refresh_timer, deadline_scheduler, octoprint, printer_registry, spotipy, watchdog, output, text_metrics, display_worker, startup_trace, stage_timer, poll_scheduler, request_guard, metrics_server
+from concurrent.futures import ThreadPoolExecutor
 
 class ProgramValues:
     def __init__(self):
         self.VERSION = 1.0
         
+        # Times each stage of the start-up
+        self.startup_trace = startup_trace.StartupTrace()
+        self.STARTUP_TRACE = False
+        # File the per-stage profile is written to on shutdown, None when not profiling
+        self.PROFILE = None
+        # Port the Prometheus metrics are served on localhost, None when the metrics endpoint is off
+        self.METRICS_PORT = None
+        
         # Headless flag
         self.HEADLESS = False
+        # Virtual display settings, None when drawing to the Inky board
+        self.VIRTUAL_DISPLAY = None
+        # Album art cache directory, None when album art is disabled
+        self.ALBUM_ART_CACHE = None
+        # OctoPrint host and port, and if the push API is used
+        self.OCTOPRINT_ADDRESS = ("octopi.local", 80)
+        self.OCTOPRINT_PUSH = False
+        # JSON config of the printers to monitor, None to only monitor OCTOPRINT_ADDRESS
+        self.PRINTERS_CONFIG = None
+        # Compressed log file the output is also written to, None to only write to stdout
+        self.LOG_FILE = None
         # Parse Arguments
         self.debug_session = self.parse_arguments()
         
@@ -31,24 +51,31 @@ class ProgramValues:
         
         try:
             print("Initialising Output...")
-            self.output = output.Output(isDebugging=self.debug_session)
+            log_file = output.LogFileSink(self.LOG_FILE) if self.LOG_FILE is not None else None
+            self.output = output.Output(isDebugging=self.debug_session, log_file=log_file)
         except Exception as Ex:
             raise ModuleNotFoundError(f"Unable to initialise the Output Class!\n{Ex}")
         
         else:
             self.output.out("Output initialised!", f"{__class__.__name__}")
         
+        # 'kill -USR1 <pid>' dumps the recent output, SIGUSR1 doesn't exist on Windows
+        # The dump is queued from another thread in case the signal arrived while the main thread held the queue's lock
+        if (hasattr(signal, "SIGUSR1")):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(target=self.output.dump, args=("SIGUSR1",),
+                                                                                 daemon=True).start())
+        
         try:
             # Initialise WatchDog Class
             self.output.out("Initialising WatchDog...", f"{__class__.__name__}")
             self.watchdog = watchdog.WatchDog(self.output)
             
         except Exception as Ex:
-            self.output.out("Failed to initialise WatchDog!", f"{__class__.__name__}", "error")
+            self.output.out("Failed to initialise WatchDog!", f"{__class__.__name__}", status="error")
             raise ModuleNotFoundError(f"Unable to initialise the WatchDog Class!\n{Ex}")
         
         else:
-            self.output.out("WatchDog initialised!", f"{__class__.__name__}", "success")
+            self.output.out("WatchDog initialised!", f"{__class__.__name__}", status="success")
         
         
         self.output.out("Initialising Classes...", f"{__class__.__name__}")
@@ -57,33 +84,78 @@ class ProgramValues:
             # Initialise refresh timer class
             self.refresh_timer = refresh_timer.RefreshTimer(self.output, self.watchdog)
             
+            # Wakes the main loop when a refresh is due or the Spotify loop publishes a change
+            self.scheduler = deadline_scheduler.DeadlineScheduler()
+            
+            # Decides how long the Spotify loop waits between polls
+            self.poll_scheduler = poll_scheduler.PollScheduler(idle_max=self.refresh_timer.get_max_wait())
+            
             # Initialise spotipy classes
             self.spotipy_values = spotipy.SpotipyValues()
-            self.spotipy_api = spotipy.SpotipyAPI()
+            self.spotipy_api = spotipy.SpotipyAPI(self.output)
 
             # Initialise octoprint classes
             self.octo_print_values = octoprint.OctoPrintValues()
-            self.octo_print_api = octoprint.OctoPrintAPI()
+            # The progress is interpolated between polls, so the printers only need polling once a minute
+            if (self.PRINTERS_CONFIG is not None):
+                self.printer_registry = printer_registry.PrinterRegistry.load(self.output, self.PRINTERS_CONFIG, cache_ttl=60)
+            else:
+                self.printer_registry = printer_registry.PrinterRegistry(self.output, [
+                    printer_registry.RegisteredPrinter("OctoPrint", octoprint.OctoPrintAPI(*self.OCTOPRINT_ADDRESS, cache_ttl=60,
+                                                                                       output=self.output))])
+            
+            printers = self.printer_registry.get_printers()
+            
+            self.octo_print_push = []
+            if (self.OCTOPRINT_PUSH):
+                # Keeps the printer snapshots up to date from the push API, polling is the fallback while it is disconnected.
+                # With several printers the values are published from the selected job instead
+                from classes import octoprint_push
+                values = self.octo_print_values if len(printers) == 1 else None
+                self.octo_print_push = [octoprint_push.OctoPrintPush(self.output, printer.api, values) for printer in printers]
+            
+            # Text size cache shared by ProgramLogic and Display
+            self.text_metrics = text_metrics.TextMetrics()
+            
+            # Rolling timings of the main loop, Spotify loop and display stages, shared with Display
+            self.stage_timer = stage_timer.StageTimer(profile=self.PROFILE is not None)
             
             if (not self.HEADLESS):
                 # Initialise Display class
-                self.display = display.Display(output=self.output)
+                backend = None
+                if (self.VIRTUAL_DISPLAY is not None):
+                    from classes import virtual_inky
+                    backend = virtual_inky.VirtualInky(output_dir=self.VIRTUAL_DISPLAY["output_dir"],
+                                                       image_format=self.VIRTUAL_DISPLAY["image_format"])
+                
+                album_art_pipeline = None
+                if (self.ALBUM_ART_CACHE is not None):
+                    from classes import album_art
+                    album_art_pipeline = album_art.AlbumArt(self.output,
+                                                            album_art.HTTPAlbumArtSource(),
+                                                            album_art.AlbumArtCache(self.ALBUM_ART_CACHE))
+                
+                # The display is cleaned and the splash screen shown by the display worker during start-up
+                with self.startup_trace.stage("display_init"):
+                    self.display = display.Display(output=self.output, text_metrics=self.text_metrics, backend=backend,
+                                                   album_art=album_art_pipeline, startup_screen=False, stage_timer=self.stage_timer,
+                                                   # Below the periodic redraw, allowing for the display worker starting a refresh late
+                                                   minor_interval=self.refresh_timer.get_max_wait() - self.refresh_timer.get_min_wait())
+                
+                # Renders to the display on its own thread
+                self.display_worker = display_worker.DisplayWorker(self.output, self.watchdog, self.display)
         except Exception as Ex:
-            self.output.out("Failed to initialise Classes", f"{__class__.__name__}", "error")
+            self.output.out("Failed to initialise Classes", f"{__class__.__name__}", status="error")
             raise ModuleNotFoundError(f"Unable to initialise Classes!\n{Ex}")
             
         else:
-            self.output.out("Successfully Initialised Classes!", f"{__class__.__name__}", "success")
+            self.output.out("Successfully Initialised Classes!", f"{__class__.__name__}", status="success")
 
 
-        # Spotify Values
-        self.spotify_status = None
-        self.song_id = str
+        # Spotify Values, a copy of the latest snapshot and its version from spotipy_values
+        self.now_playing_version, self.now_playing = self.spotipy_values.get_snapshot()
         self.song_name = str
         self.song_artist = str
-        self.explicit_song = None
-        self.song_progress = None
-        self.song_duration = None
         
         self.current_top_artist = str
         self.top_artists_pointer = 0
@@ -98,6 +170,25 @@ class ProgramValues:
         parser = argparse.ArgumentParser()
         parser.add_argument("-d", action="store_true", required=False)
         parser.add_argument("-headless", action="store_true", required=False)
+        parser.add_argument("-virtual", nargs="?", const="frames", default=None, required=False, metavar="DIR",
+                            help="Draw to a virtual display, writing each frame to DIR")
+        parser.add_argument("-virtual-format", choices=("png", "raw"), default="png", required=False)
+        parser.add_argument("-album-art", nargs="?", const=".album_art", default=None, required=False, metavar="CACHE_DIR",
+                            help="Show album art, caching the dithered art in CACHE_DIR")
+        parser.add_argument("-octoprint", default=None, required=False, metavar="HOST[:PORT]",
+                            help="Address of the OctoPrint server, defaults to octopi.local:80")
+        parser.add_argument("-printers", default=None, required=False, metavar="CONFIG",
+                            help="JSON config of the printers to monitor, used instead of -octoprint")
+        parser.add_argument("-octoprint-push", action="store_true", required=False,
+                            help="Get the print progress from the OctoPrint push API, polling while it is disconnected")
+        parser.add_argument("-log-file", nargs="?", const="logs/spotipi.log.gz", default=None, required=False, metavar="PATH",
+                            help="Also write the output to a size rotated, compressed log file in batches")
+        parser.add_argument("--startup-trace", action="store_true", required=False,
+                            help="Show how long each stage of the start-up took")
+        parser.add_argument("--profile", nargs="?", const="spotipi-profile.txt", default=None, required=False, metavar="PATH",
+                            help="Profile each main loop, Spotify loop and display stage, writing the report to PATH on shutdown")
+        parser.add_argument("-metrics", nargs="?", type=int, const=9464, default=None, required=False, metavar="PORT",
+                            help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
         
         args = parser.parse_args()
         
@@ -105,6 +196,35 @@ class ProgramValues:
             print("Running HEADLESS!")
             self.HEADLESS = True
         
+        elif (args.virtual is not None):
+            print(f"Using a virtual display, frames will be saved to '{args.virtual}'")
+            self.VIRTUAL_DISPLAY = {"output_dir": args.virtual, "image_format": args.virtual_format}
+        
+        if (args.album_art is not None):
+            self.ALBUM_ART_CACHE = args.album_art
+        
+        if (args.octoprint is not None):
+            host, _, port = args.octoprint.partition(":")
+            self.OCTOPRINT_ADDRESS = (host, int(port) if port else 80)
+        
+        if (args.printers is not None):
+            self.PRINTERS_CONFIG = args.printers
+        
+        if (args.octoprint_push):
+            self.OCTOPRINT_PUSH = True
+        
+        if (args.log_file is not None):
+            self.LOG_FILE = args.log_file
+        
+        if (args.startup_trace):
+            self.STARTUP_TRACE = True
+        
+        if (args.profile is not None):
+            self.PROFILE = args.profile
+        
+        if (args.metrics is not None):
+            self.METRICS_PORT = args.metrics
+        
         if (args.d):
             return True
         else:
@@ -121,22 +241,29 @@ class ProgramValues:
     # --- Update Spotify Values function
     def update_spotify_values(self):
         """
-        Calls the spotipy_values class to get the new song values and saves them to program_values
+        Takes the latest NowPlaying snapshot and its version from the spotipy_values class
         """
         try:
             self.output.debug("Updating song values...", f"{__class__.__name__}")
             
-            self.set_song_id(self.spotipy_values.get_song_id())
-            self.set_song_name(self.spotipy_values.get_song_name())
-            self.set_song_artist(self.spotipy_values.get_artist_name())
-            self.set_explicit_song(self.spotipy_values.get_explicit_song())
-            self.set_song_progress(self.spotipy_values.get_song_progress())
-            self.set_song_duration(self.spotipy_values.get_song_duration())
+            self.now_playing_version, self.now_playing = self.spotipy_values.get_snapshot()
+            self.set_song_name(self.now_playing.song_name)
+            self.set_song_artist(self.now_playing.artist_name)
         except Exception as Ex:
-            self.output.out("Unable to update Spotify Values!", f"{__class__.__name__}", "warning")
+            self.output.out("Unable to update Spotify Values!", f"{__class__.__name__}", status="warning")
         else:
             self.output.debug("Song values updated successfully!", f"{__class__.__name__}")
 
+    # --- Top Artists --- #
+    def set_top_artists(self, top_artists):
+        """
+        Saves the users top artists and pre-renders their frames for the display
+        """
+        self.spotipy_values.set_top_artists(top_artists)
+        
+        if (not self.HEADLESS):
+            self.display.prerender_top_artists(top_artists)
+
     # --- Active Sesson --- #
     def set_active_session(self, active_session):
         self.active_session = active_session
@@ -150,19 +277,12 @@ class ProgramValues:
     def get_last_active(self):
         return self.last_active
 
-    # --- Spotify Status --- #
-    def set_spotify_status(self, spotify_status):
-        self.spotify_status = spotify_status
-
-    def get_spotify_status(self):
-        return self.spotify_status
+    # --- Now Playing --- #
+    def get_now_playing(self) -> spotipy.NowPlaying:
+        return self.now_playing
 
-    # --- Song ID --- #
-    def set_song_id(self, song_id):
-        self.song_id = song_id
-
-    def get_song_id(self):
-        return self.song_id
+    def get_now_playing_version(self) -> int:
+        return self.now_playing_version
 
     # --- Song Name --- #
     def set_song_name(self, song_name):
@@ -191,28 +311,11 @@ class ProgramValues:
     def get_top_artist_pointer(self):
         return self.top_artists_pointer
 
-    # --- Explicit --- #
-    def set_explicit_song(self, explicit):
-        self.explicit = explicit
-
-    def get_explicit_song(self):
-        return self.explicit
-
-    # --- Song Progress and Duration --- #
-    def set_song_progress(self, song_progress):
-        self.song_progress = song_progress
-
-    def get_song_progress(self):
-        return self.song_progress
-
-    def set_song_duration(self, song_duration):
-        self.song_duration = song_duration
-
-    def get_song_duration(self):
-        return self.song_duration
-
 
 class ProgramLogic:
+    # Longest the main loop blocks for before checking in with the watchdog
+    WATCHDOG_INTERVAL = 60
+    
     def __init__(self):
             
         try:
@@ -224,29 +327,177 @@ class ProgramLogic:
             raise ModuleNotFoundError(f"Unable to initialise the ProgramValues Class!\n{Ex}")
         
         else:
-            self.program_values.output.out("Program Values initialised!", f"{__class__.__name__}", "success")
+            self.program_values.output.out("Program Values initialised!", f"{__class__.__name__}", status="success")
             
         # Try and initialise threads
         try:
             self.program_values.output.out("Initialising Threads...", f"{__class__.__name__}")
 
-            self.refresh_timer_thread = threading.Thread(target=self.program_values.refresh_timer.refresh_timer_loop)
-            self.spotiPi_thread = threading.Thread(target=self.spotiPiLogic_loop)
+            self.spotiPi_thread = threading.Thread(target=self.spotiPiLogic_loop, name="SpotifyLoop")
 
             # Set each thread as a Daemon so they die with the main program upon exit
-            self.refresh_timer_thread.daemon = True
             self.spotiPi_thread.daemon = True
 
         except Exception as Ex:
-            self.program_values.output.out("Failed to initialise Threads!", f"{__class__.__name__}", "error")
+            self.program_values.output.out("Failed to initialise Threads!", f"{__class__.__name__}", status="error")
             raise RuntimeError(f"Unable to initialise Threads!\n{Ex}")
         else:
-            self.program_values.output.out("Threads initialised!", f"{__class__.__name__}", "success")
+            self.program_values.output.out("Threads initialised!", f"{__class__.__name__}", status="success")
+
+    def startup(self, max_retries=5, retry_delay=5):
+        """
+        Runs the start-up stages. The display is cleaned and shows the splash screen on the display worker
+        while the connection check and the Spotify token and top artists loads run at the same time.
+
+        Raises:
+            TimeoutError: Raised if the connection check fails max_retries times
+        """
+        trace = self.program_values.startup_trace
+        
+        def show_startup_screen():
+            with trace.stage("clean_and_splash"):
+                self.program_values.display.show_startup_screen()
+        
+        # Clean the display and show the splash screen in the background
+        if (not self.program_values.HEADLESS):
+            self.program_values.display_worker.start(first_task=show_startup_screen)
+        
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="Startup") as executor:
+            connection = executor.submit(self.wait_for_connection, max_retries, retry_delay)
+            spotify = executor.submit(self.load_spotify, connection)
+            
+            connection.result()
+            spotify.result()
+
+    def wait_for_connection(self, max_retries, retry_delay):
+        """
+        Checks the connection, retrying every retry_delay seconds
+
+        Raises:
+            TimeoutError: Raised if the connection check fails max_retries times
+        """
+        with self.program_values.startup_trace.stage("connection_check"):
+            for _ in range(max_retries):
+                if (self.connection_check()):
+                    return
+                
+                self.program_values.output.out(f"Unable to connect to endpoint, retrying in {retry_delay}s...", "connCheck")
+                time.sleep(retry_delay)
+            
+            raise TimeoutError("Unable to connect to endpoint and reached max retries")
+
+    def load_spotify(self, connection):
+        """
+        Loads the Spotify token and the users top artists.
+        If the first attempt fails it is retried once the connection check has passed.
+
+        Args:
+            connection (Future): The connection check
+        """
+        trace = self.program_values.startup_trace
+        
+        try:
+            with trace.stage("oauth_token"):
+                self.program_values.spotipy_api.load_token()
+            with trace.stage("top_artists"):
+                top_artists = self.program_values.spotipy_api.get_top_artists()
+        
+        except Exception as Ex:
+            self.program_values.output.debug("Unable to load Spotify before the connection check passed: %s", "Startup", Ex)
+            connection.result()
+            
+            with trace.stage("top_artists_retry"):
+                top_artists = self.program_values.spotipy_api.get_top_artists()
+        
+        with trace.stage("prerender_top_artists"):
+            self.program_values.set_top_artists(top_artists)
 
     def start_threads(self):
-        self.refresh_timer_thread.start()
         self.spotiPi_thread.start()
+        self.program_values.spotipy_api.start_token_refresher()
+        
+        for push_client in self.program_values.octo_print_push:
+            push_client.start()
+        
         self.program_values.watchdog.start("ProgramLogic")
+        
+        if (self.program_values.METRICS_PORT is not None):
+            try:
+                self.metrics_server = metrics_server.MetricsServer(self.program_values.output, self.collect_metrics,
+                                                                   port=self.program_values.METRICS_PORT)
+                self.metrics_server.start()
+            except OSError as Ex:
+                # The metrics are optional, SpotiPi keeps running without them
+                self.program_values.output.out(f"Unable to serve metrics on port {self.program_values.METRICS_PORT}!\n{Ex}", "Metrics Server", status="error")
+
+    def collect_metrics(self, writer):
+        """
+        Writes the counters and histograms the classes already keep, called on the metrics server's thread for each scrape
+
+        Args:
+            writer (MetricsWriter): The scrape being built
+        """
+        values = self.program_values
+        
+        # --- Spotify --- #
+        guard = values.spotipy_api.get_request_guard()
+        writer.counter("spotify_requests_total", "Spotify requests made", [({"endpoint": endpoint}, count) for endpoint, count in dict(guard.get_requests()).items()])
+        writer.counter("spotify_request_errors_total", "Spotify requests that failed", [({"endpoint": endpoint}, count) for endpoint, count in dict(guard.get_errors()).items()])
+        writer.histogram("spotify_request_seconds", "Spotify request latency", [({"endpoint": endpoint}, histogram) for endpoint, histogram in dict(guard.get_latency()).items()])
+        writer.counter("spotify_rate_limited_total", "Spotify requests that were rate limited", [(None, guard.get_rate_limited())])
+        writer.counter("spotify_blocked_total", "Spotify requests not made while rate limited or the circuit was open", [(None, guard.get_blocked())])
+        writer.counter("spotify_token_refreshes_total", "Spotify OAuth token refreshes", [(None, values.spotipy_api.get_token_refresh_count())])
+        
+        # --- OctoPrint --- #
+        printers = values.printer_registry.get_printers()
+        writer.counter("octoprint_requests_total", "OctoPrint requests made", [({"printer": printer.name}, printer.api.get_request_count()) for printer in printers])
+        writer.histogram("octoprint_request_seconds", "OctoPrint /api/job request latency", [({"printer": printer.name}, printer.api.get_latency()) for printer in printers])
+        writer.counter("octoprint_cache_hits_total", "OctoPrint snapshots served from the cache", [({"printer": printer.name}, printer.api.get_cache_hits()) for printer in printers])
+        writer.counter("octoprint_fast_fails_total", "OctoPrint snapshots skipped while the printer was offline", [({"printer": printer.name}, printer.api.get_fast_fail_count()) for printer in printers])
+        writer.gauge("octoprint_offline", "1 while the printer is treated as offline", [({"printer": printer.name}, printer.api.is_offline()) for printer in printers])
+        writer.gauge("octoprint_poll_seconds", "Time the last poll of all the printers took", [(None, values.printer_registry.get_last_poll_latency())])
+        
+        # --- Caches --- #
+        writer.counter("text_metrics_hits_total", "Text sizes served from the cache", [(None, values.text_metrics.get_hits())])
+        writer.counter("text_metrics_misses_total", "Text sizes measured", [(None, values.text_metrics.get_misses())])
+        
+        # --- Display --- #
+        if (not values.HEADLESS):
+            display = values.display
+            writer.counter("display_refreshes_total", "Display refreshes pushed to the panel", [(None, display.get_pushed_refreshes())])
+            writer.counter("display_partial_refreshes_total", "Partial display refreshes", [(None, display.get_partial_refreshes())])
+            writer.counter("display_skipped_refreshes_total", "Refreshes skipped as the frame was unchanged", [(None, display.get_skipped_refreshes())])
+            writer.counter("display_deferred_refreshes_total", "Refreshes held back by the refresh policy", [(None, display.get_deferred_refreshes())])
+            writer.histogram("display_refresh_seconds", "Time taken to refresh the panel", [({"mode": mode}, histogram) for mode, histogram in display.get_refresh_latency().items()])
+            
+            if (display.album_art is not None):
+                writer.counter("album_art_cache_hits_total", "Album art served from the disk cache", [(None, display.album_art.cache.hits)])
+                writer.counter("album_art_cache_misses_total", "Album art not in the disk cache", [(None, display.album_art.cache.misses)])
+            
+            worker = values.display_worker
+            writer.counter("display_updates_dropped_total", "Display updates replaced by a newer one before being drawn", [(None, worker.get_dropped())])
+            writer.gauge("display_update_max_seconds", "Longest time from an update being submitted to it being drawn", [(None, worker.get_max_latency())])
+        
+        # --- Stages --- #
+        stages = values.stage_timer.get_stages()
+        summaries = []
+        for name in stages:
+            count, p50, p95, maximum = values.stage_timer.get_stats(name)
+            # The quantiles are of the recent durations, the sum and count of the whole run
+            summaries.append(({"stage": name}, [(0.5, p50), (0.95, p95), (1.0, maximum)], count, values.stage_timer.get_total(name)))
+        writer.summary("stage_seconds", "Durations of each main loop, Spotify loop and display stage", summaries)
+        
+        # --- Health --- #
+        writer.gauge("watchdog_check_in_age_seconds", "Seconds since each thread last checked in with the watchdog",
+                     [({"area": area}, age) for area, age in values.watchdog.get_check_in_ages().items()])
+        
+        threads = [self.spotiPi_thread, values.watchdog.thread, values.output.writer, getattr(values.spotipy_api, "token_refresher", None)]
+        threads += [push_client.thread for push_client in values.octo_print_push]
+        if (not values.HEADLESS):
+            threads.append(values.display_worker.thread)
+        writer.gauge("thread_alive", "1 if the thread is running", [({"thread": thread.name}, thread.is_alive()) for thread in threads if thread is not None])
+        
+        writer.counter("output_dropped_total", "Output records dropped as the queue was full", [(None, values.output.get_dropped())])
 
     def remove_brackets_from_song_name(self):
         """Takes a String and removes all the brackets that contain a keyword.
@@ -286,17 +537,21 @@ class ProgramLogic:
                         for x in key_word_list:
                             # if 'i' (set to the current item being itterated through in the brcket_list) is in the string 'song_name'
                             if (i in song_name):
-                                self.program_values.output.debug(f"Found '{i}' in '{song_name}'", "Remove Brackets")
+                                # Logged lazily so nothing is formatted unless debugging
+                                self.program_values.output.debug("Found '%s' in '%s'", "Remove Brackets", i, song_name)
+
+                                # The bracketed sub-string changes with each loop using the bracket_position_list defined earlier and using 'c' (int) to iterate through each position in the list
+                                start = bracket_position_list[c]
+                                bracketed = song_name[start : song_name[start : ].index(')' if i == '(' else ']') + start + 1 ]
 
-                                # If keyword 'x' is in a sub-string of the song_name
-                                # The sub-string changes with each loop using the bracket_position_list defined earlier and using 'c' (int) to iterate through each position in the list
-                                if (x in song_name[bracket_position_list[c] : song_name[bracket_position_list[c] : ].index(')' if i == '(' else ']') + bracket_position_list[c] + 1 ].lower() ):
-                                    self.program_values.output.debug(f"'{song_name}' contains key word '{x}'", "Remove Brackets")
-                                    self.program_values.output.debug(f"Removing '{song_name[bracket_position_list[c] : song_name[bracket_position_list[c] : ].index(')' if i == '(' else ']') + bracket_position_list[c] + 1 ]}' from song name", "Remove Brackets")
+                                # If keyword 'x' is in the bracketed sub-string of the song_name
+                                if (x in bracketed.lower()):
+                                    self.program_values.output.debug("'%s' contains key word '%s'", "Remove Brackets", song_name, x)
+                                    self.program_values.output.debug("Removing '%s' from song name", "Remove Brackets", bracketed)
 
                                     # Appends the sub-string to the list 'string_to_remove' to remove at the end
                                     # The sub-strings to remove are added to a list instead of removed from the string as removing them would change the position of the next brackets in the next loop
-                                    string_to_remove.append(song_name[bracket_position_list[c] : song_name[bracket_position_list[c] : ].index(')' if i == '(' else ']') + bracket_position_list[c] + 1 ])
+                                    string_to_remove.append(bracketed)
 
                 # If the string_to_remove contains a value (E.g. a bracket sub-string to remove from the string)
                 if (string_to_remove is not None):
@@ -309,12 +564,12 @@ class ProgramLogic:
                     while("  " in song_name):
                         song_name = song_name.replace("  ", " ")
                         
-                    self.program_values.output.debug(f"Song name set to '{song_name}'", "Remove Brackets")
+                    self.program_values.output.debug("Song name set to '%s'", "Remove Brackets", song_name)
 
         # Catches the value error thrown by .index()
         except ValueError as ex:
-            self.program_values.output.out("Unable to remove brackets!", "Remove Brackets", "error")
-            self.program_values.output.out(ex, "Remove Brackets", "error")
+            self.program_values.output.out("Unable to remove brackets!", "Remove Brackets", status="error")
+            self.program_values.output.out(ex, "Remove Brackets", status="error")
 
         # Returns the song_name string stripped of leading and trailing whitespaces
         return song_name.strip()
@@ -331,14 +586,17 @@ class ProgramLogic:
             formatted_string (str): Returns the given string with a reduced length to fit onto the screen
         """
 
+        metrics = self.program_values.text_metrics
+        
+        # The explicit tag is measured once rather than on every width check
+        extra_width = 0
+        if (identifier == "song" and self.program_values.get_now_playing().explicit):
+            extra_width = metrics.get_width(self.program_values.display.get_EXPLICIT_FONT(), "E") + 10
+
         def calculate_string_width(string):
             """Helper function to calculate string width with optional explicit marker."""
             
-            string_width, _ = font.getsize(string)
-            if (identifier == "song" and self.program_values.get_explicit_song()):
-                explicit_w, _ = self.program_values.display.get_EXPLICIT_FONT().getsize("E")
-                string_width += explicit_w + 10
-            return string_width
+            return metrics.get_width(font, string) + extra_width
 
         # Only song names should have everything after the - removed
         if (identifier == "song" and "-" in unformatted_string):
@@ -348,22 +606,33 @@ class ProgramLogic:
         unformatted_string_w = calculate_string_width(unformatted_string)
 
         # Check if shortening is needed
-        max_width = self.program_values.display.get_inky_display().WIDTH - 5
+        max_width = self.program_values.display.get_text_width()
         if (unformatted_string_w <= max_width):
             return unformatted_string
 
-        # Binary search for optimal string length
+        # Binary search for optimal string length using the estimated prefix widths
+        prefix_widths = metrics.prefix_widths(font, unformatted_string)
+        ellipsis_w = metrics.get_width(font, "..")
+        
         left, right = 0, len(unformatted_string)
         while (left < right):
             mid = (left + right) // 2
-            test_string = unformatted_string[:mid].strip() + ".."
-            if (calculate_string_width(test_string) <= max_width):
+            if (prefix_widths[mid] + ellipsis_w + extra_width <= max_width):
                 left = mid + 1
             else:
                 right = mid
 
+        # The estimate ignores kerning and stripping, so correct it with the measured widths
+        def fits(length):
+            return calculate_string_width(unformatted_string[:length].strip() + "..") <= max_width
+
+        while (right > 0 and not fits(right - 1)):
+            right -= 1
+        while (right < len(unformatted_string) and fits(right)):
+            right += 1
+
         formatted_string = unformatted_string[:right - 1].strip() + ".."
-        self.program_values.output.debug(f"Song shortened to: {formatted_string}", "Shorten String")
+        self.program_values.output.debug("Song shortened to: %s", "Shorten String", formatted_string)
         return formatted_string
 
 
@@ -392,67 +661,68 @@ class ProgramLogic:
         # Spotify API endpoint to check connection
         endpoint = "https://api.spotify.com/"
 
-        print("")
             
         try:
-            if (self.program_values.octo_print_api.is_printer_connected()):
-                self.program_values.output.out("Printer is connected!", "connCheck")
-
-                if (self.program_values.octo_print_values.get_isPrinting()):
-                    self.program_values.output.out(f"Printer is {self.program_values.octo_print_api.get_print_progress()}!", "connCheck")
+            # Every configured printer is checked, polled at the same time so an offline one doesn't hold up the others
+            for name, printer in self.program_values.printer_registry.poll():
+                if (printer.operational):
+                    self.program_values.output.out("'%s' is connected, %s!", "connCheck", name, printer.state)
 
                 else:
-                    self.program_values.output.out("Printer is not printing!", "connCheck")
-
-            else:
-                self.program_values.output.out("Printer is not connected!", "connCheck")
+                    self.program_values.output.out("'%s' is not connected!", "connCheck", name)
                 
             self.program_values.output.out(f"Testing connection to '{endpoint}'...", "connCheck")
             # Send GET request to Spotify API
-            response = requests.get(endpoint)
+            response = requests.get(endpoint, timeout=(3, 10))
 
             # Check if response status code is successful (200)
             if response.status_code == 200:
-                self.program_values.output.out(f"'{endpoint}' returned status code 200", "connCheck", "success")
+                self.program_values.output.out(f"'{endpoint}' returned status code 200", "connCheck", status="success")
                 return True
             else:
-                self.program_values.output.out(f"'{endpoint}' returned status code {response.status_code}", "connCheck", "failed")
+                self.program_values.output.out(f"'{endpoint}' returned status code {response.status_code}", "connCheck", status="failed")
                 return False
 
         except requests.ConnectionError as ConnEx:
-            self.program_values.output.debug(f"ConnectionError when trying to connect to {endpoint}", "connCheck")
+            self.program_values.output.debug("ConnectionError when trying to connect to %s", "connCheck", endpoint)
             return False
 
         except Exception as Ex:
             # Error occurred during request
-            self.program_values.output.out(f"Error occoured when trying to connect to the printer!", "connCheck", "error")
+            self.program_values.output.out(f"Error occoured when trying to connect to the printer!", "connCheck", status="error")
 
     def octoPrint_logic(self):
         """
         Sets the "isPrinting" value to True if something is being printed and to False if not.
+        All the printers are polled at the same time, the registry picks which job is shown.
         """
         
         try:
-            if (self.program_values.octo_print_api.is_printer_connected()):
-                self.program_values.output.out("Printer is connected!", "OctoPrintLogic")
-
-                if (str(self.program_values.octo_print_api.get_printer_status()).lower() == "printing"):
-                    self.program_values.output.out("Printer is printing!", "OctoPrintLogic")
-
-                    self.program_values.octo_print_values.set_isPrinting(True)
-                    self.program_values.octo_print_values.set_progress(self.program_values.octo_print_api.get_print_progress())
+            registry = self.program_values.printer_registry
+            requests_before = registry.get_request_count()
+            
+            snapshots = registry.poll()
+            name, printer = registry.select(snapshots)
+            
+            self.program_values.output.debug("%d/%d printers connected", "OctoPrintLogic", sum(snapshot.operational for _, snapshot in snapshots), len(snapshots))
+            
+            if (printer is not None):
+                self.program_values.output.out(f"'{name}' is printing!", "OctoPrintLogic")
 
-                    self.program_values.output.octoPrintProgress("OctoPrintLogic", self.program_values.octo_print_values.get_progress())
+                # Published together so the display never sees printing with the last print's progress
+                self.program_values.octo_print_values.publish(True, printer.progress or 0, printer.print_time_left, printer.fetched_at)
 
-                else:
-                    self.program_values.octo_print_values.set_isPrinting(False)
-                    self.program_values.output.debug("Printer is not printing!", "OctoPrintLogic")
+                self.program_values.output.octoPrintProgress("OctoPrintLogic", self.program_values.octo_print_values.get_progress())
 
             else:
-                self.program_values.output.debug("Printer is not connected!", "OctoPrintLogic")
+                self.program_values.octo_print_values.set_isPrinting(False)
+                self.program_values.output.debug("No printer is printing!", "OctoPrintLogic")
+            
+            self.program_values.output.debug("OctoPrint requests this cycle: %d, poll took %.2fs", "OctoPrintLogic",
+                                             registry.get_request_count() - requests_before, registry.get_last_poll_latency())
 
         except Exception as Ex:
-            self.program_values.output.out(f"An error occoured when getting the print progress\n{Ex}", "OctoPrintLogic", "error")
+            self.program_values.output.out(f"An error occoured when getting the print progress\n{Ex}", "OctoPrintLogic", status="error")
 
     def spotiPiLogic_loop(self):
         """
@@ -466,89 +736,98 @@ class ProgramLogic:
         """
         
         self.program_values.output.debug("Beginning SpotiPy Loop", f"{__class__.__name__}")
-        self.program_values.spotipy_values.get_top_artists()
 
-        while(True):
+        while(not self.program_values.watchdog.exit_flag.is_set()):
             try:
-                # While seconds waited > min_wait time
-                while(self.program_values.refresh_timer.get_seconds_waited() > self.program_values.refresh_timer.get_min_wait()):
-                    self.program_values.watchdog.check_in("Spotipy_Loop")
-                    self.program_values.output.debug("Spotify Checking values", f"Spotipy Loop")
-
-                    spotify_data = self.program_values.spotipy_api.get_currently_playing()
-                    self.program_values.spotipy_values.set_spotify_status(spotify_data[0])
-
-                    self.program_values.output.debug(f"Spotify Status: {spotify_data[0]}", "Spotify Loop")
-
-                    # If spotify reports the status as either "playing" or "paused"
-                    if (self.program_values.spotipy_values.get_spotify_status() != "stopped"):
-                        # Update latest activity with datetime.now()
-                        self.program_values.set_last_active(datetime.datetime.now())
-
-                        # Update the SPOTIPY values
-                        self.program_values.spotipy_values.set_song_progress(spotify_data[5] / 1000)
+                self.program_values.watchdog.check_in("Spotipy_Loop")
+                self.program_values.output.debug("Spotify Checking values", f"Spotipy Loop")
+                
+                # Set by the poll scheduler unless the song has just started
+                wait_time = None
 
-                        # If the current ID held in spotify values is not the same as the one just retrieved
-                        if (self.program_values.spotipy_values.get_song_id() != spotify_data[1]):
-                            if ((spotify_data[5] / 1000) > 5):
-                                # Update the values held in spotify values to the ones just retrieved
-                                self.program_values.spotipy_values.set_song_id(spotify_data[1])
-                                self.program_values.spotipy_values.set_song_name(spotify_data[2])
-                                self.program_values.spotipy_values.set_artist_name(spotify_data[3])
-                                self.program_values.spotipy_values.set_explicit_song(spotify_data[4])
-                                self.program_values.spotipy_values.set_song_progress(spotify_data[5] / 1000)
-                                self.program_values.spotipy_values.set_song_duration(spotify_data[6] / 1000)
+                with self.program_values.stage_timer.span("spotify.get_currently_playing"):
+                    now_playing = self.program_values.spotipy_api.get_currently_playing()
+                version, current = self.program_values.spotipy_values.get_snapshot()
 
-                                self.program_values.output.out("Song has changed!", f"spotipy loop")
+                self.program_values.output.debug("Spotify Status: %s", "Spotify Loop", now_playing.status)
 
-                                print()
+                # If spotify reports the status as either "playing" or "paused"
+                if (now_playing.status != "stopped"):
+                    # Update latest activity with datetime.now()
+                    self.program_values.set_last_active(datetime.datetime.now())
 
-                                self.program_values.output.out(f"Current Song ID        -->  {self.program_values.get_song_id()}", "Spotify Loop")
-                                self.program_values.output.out(f"Current Song Name      -->  {self.program_values.get_song_name()}", "Spotify Loop")
-                                self.program_values.output.out(f"Current Song Artist    -->  {self.program_values.get_song_artist()}", "Spotify Loop")
+                    # If the current ID held in spotify values is not the same as the one just retrieved
+                    if (current.song_id != now_playing.song_id):
+                        if (now_playing.progress > 5):
+                            # Publish the new song, this bumps the version so the main loop redraws
+                            self.program_values.spotipy_values.publish(now_playing)
 
-                                print()
+                            self.program_values.output.out("Song has changed!", f"spotipy loop")
 
-                                self.program_values.output.out(f"New Song ID            -->  {self.program_values.spotipy_values.get_song_id()}", "Spotify Loop")
-                                self.program_values.output.out(f"New Song Name          -->  {self.program_values.spotipy_values.get_song_name()}", "Spotify Loop")
-                                self.program_values.output.out(f"New Song Artist        -->  {self.program_values.spotipy_values.get_artist_name()}", "Spotify Loop")
+                            self.program_values.output.out(f"Current Song ID        -->  {current.song_id}", "Spotify Loop")
+                            self.program_values.output.out(f"Current Song Name      -->  {current.song_name}", "Spotify Loop")
+                            self.program_values.output.out(f"Current Song Artist    -->  {current.artist_name}", "Spotify Loop")
 
-                                print()
+                            self.program_values.output.out(f"New Song ID            -->  {now_playing.song_id}", "Spotify Loop")
+                            self.program_values.output.out(f"New Song Name          -->  {now_playing.song_name}", "Spotify Loop")
+                            self.program_values.output.out(f"New Song Artist        -->  {now_playing.artist_name}", "Spotify Loop")
 
-                                #wait_time = min(max(math.ceil((spotify_data[6] / 1000 / 10) ), 10), 20)
-                                wait_time = (math.ceil((spotify_data[6] / 1000 / 10)))
-                                self.program_values.output.debug(f"Wait time set to {wait_time}s", "Spotify Loop")
+                        else:
+                            # Only the status and progress are updated until the song has reached 5+ seconds
+                            self.program_values.spotipy_values.publish(current._replace(status=now_playing.status, progress=now_playing.progress), changed=False)
 
-                            else:
-                                # If the song has just started, wait until it has reached 5+ seconds before updating values
-                                wait_time = 5 - (spotify_data[5] / 1000)
-                                self.program_values.output.out(f"Song just started, waiting {wait_time}", "Spotify Loop")
+                            # If the song has just started, wait until it has reached 5+ seconds before updating values
+                            wait_time = 5 - now_playing.progress
+                            self.program_values.output.out(f"Song just started, waiting {wait_time}", "Spotify Loop")
 
                     else:
-                        # Active session check
-                        # Show users top artists and top songs
-                        self.program_values.output.debug("Spotify not playing", f"spotipy loop")
-                        self.program_values.output.out("Showing top Artists and Songs", f"Spotipy Loop", "info")
-
-                        # If nothing has been played for 30 mins active session will be set to False
-                        if ((datetime.datetime.now() - self.program_values.get_last_active()) >= datetime.timedelta(minutes=30)):
-                            self.program_values.output.out("Inactive for too long!", "Spotify Loop")
-                            self.program_values.set_active_session(False)
+                        # Same song, only the status and progress have changed
+                        self.program_values.spotipy_values.publish(now_playing, changed=False)
 
-                        else:
-                        # Get and update top artists
-                            # This should only need to be done once so could be done on start-up?
-                        # Send them to the display
-                            self.program_values.set_current_top_artist(self.program_values.spotipy_values.get_top_artists()[self.program_values.get_top_artist_pointer()])
+                else:
+                    # Active session check
+                    # Show users top artists and top songs
+                    self.program_values.spotipy_values.publish(current._replace(status=now_playing.status), changed=False)
+                    self.program_values.output.debug("Spotify not playing", f"spotipy loop")
+                    self.program_values.output.out("Showing top Artists and Songs", f"Spotipy Loop", status="info")
 
-                        # Sets the wait_time equal to the max wait time if no song is playing.
-                        wait_time = self.program_values.refresh_timer.get_max_wait()
+                    # If nothing has been played for 30 mins active session will be set to False
+                    if ((datetime.datetime.now() - self.program_values.get_last_active()) >= datetime.timedelta(minutes=30)):
+                        self.program_values.output.out("Inactive for too long!", "Spotify Loop")
+                        self.program_values.set_active_session(False)
 
-                    time.sleep(wait_time)
+                    else:
+                    # Get and update top artists
+                        # This should only need to be done once so could be done on start-up?
+                    # Send them to the display
+                        self.program_values.set_current_top_artist(self.program_values.spotipy_values.get_top_artists()[self.program_values.get_top_artist_pointer()])
+
+                # Wake the main loop if the song or the status has changed, or the session has ended
+                if (self.program_values.spotipy_values.get_version() != version or now_playing.status != current.status or
+                    not self.program_values.get_active_session()):
+                    self.program_values.scheduler.notify("spotify")
+
+                if (wait_time is None):
+                    # Poll just after the song is predicted to end, or back off if nothing is playing
+                    wait_time = self.program_values.poll_scheduler.next_delay(now_playing.status, now_playing.progress, now_playing.duration)
+                    
+                    self.program_values.output.debug("Wait time set to %.1fs", "Spotify Loop", wait_time)
+
+                self.program_values.watchdog.exit_flag.wait(wait_time)
+
+            except request_guard.RequestBlockedError as Ex:
+                # Rate limited or the circuit breaker is open, wait until requests are allowed again
+                self.program_values.output.out(f"{Ex}, waiting {Ex.retry_in:.0f}s", "Spotify Loop", status="warning")
+                self.program_values.watchdog.check_in("Spotipy_Loop")
+                time.sleep(min(Ex.retry_in, self.program_values.refresh_timer.get_max_wait()))
 
             except Exception as Ex:
-                self.program_values.output.out(Ex, "Spotify Loop", "error")
-                break
+                # Keep polling after an error, backing off for as long as the request guard says
+                # Capped like a blocked request so the loop checks in with the watchdog before it times out
+                self.program_values.output.out(Ex, "Spotify Loop", status="error")
+                self.program_values.watchdog.check_in("Spotipy_Loop")
+                time.sleep(min(max(self.program_values.spotipy_api.get_request_guard().get_retry_delay(), 1),
+                               self.program_values.refresh_timer.get_max_wait()))
 
     def main_loop(self):
         """
@@ -556,19 +835,32 @@ class ProgramLogic:
         If the values stored are different to the one being displayed then the function formats the song name and artist name and calls the display class to
         update the screen.
         If no song is playing then the top artists are cycled through and displayed.
+        
+        Between passes the loop blocks on the deadline scheduler, only waking when the Spotify loop publishes a change,
+        when the next refresh is due or to check in with the watchdog.
         """
         
+        refresh_timer = self.program_values.refresh_timer
+        self.program_values.scheduler.schedule("refresh", refresh_timer.get_seconds_until(refresh_timer.get_ready_wait()))
+        
         # Enter loop here to begin running the display
         while(self.program_values.get_active_session() and not self.program_values.watchdog.exit_flag.is_set()):
             self.program_values.watchdog.check_in("ProgramLogic")
+            
+            self.program_values.scheduler.wait(timeout=self.WATCHDOG_INTERVAL)
+            
+            if (not self.program_values.get_active_session() or self.program_values.watchdog.exit_flag.is_set()):
+                break
+
+            # Read the latest snapshot once, the version only changes when the song does
+            version, now_playing = self.program_values.spotipy_values.get_snapshot()
 
-            # is_refresh_ready() returns true if seconds waited is greater than 15
+            # is_refresh_ready() returns true if seconds waited is greater than 20
             if (self.program_values.refresh_timer.is_refresh_ready()):
                 # Set value_changed to false ready for the next loop
                 values_changed = False
 
-                # If the current song_id in Program_Values is not the same as the current id Spotipy_Values
-                if (self.program_values.get_song_id() != self.program_values.spotipy_values.get_song_id()):
+                if (version != self.program_values.get_now_playing_version()):
                     #updated valuess
                     self.program_values.update_spotify_values()
 
@@ -576,28 +868,35 @@ class ProgramLogic:
                     values_changed = True   
 
                 # If the values have been changed or the seconds waited is greater than max wait time then refresh the screen
-                if (self.program_values.spotipy_values.get_spotify_status() != "stopped"):
+                if (now_playing.status != "stopped"):
                     if ((values_changed or 
                         self.program_values.refresh_timer.get_seconds_waited() >= self.program_values.refresh_timer.get_max_wait()) and 
-                        self.program_values.spotipy_values.get_song_progress() < (self.program_values.spotipy_values.get_song_duration() - 30)):
+                        now_playing.duration is not None and now_playing.progress < (now_playing.duration - 30)):
 
                         self.program_values.output.out("Updating the screen", f"Main Loop")
 
                         # --- Spotify Code --- #
                         # Formatted song and artist name ready to be displayed
-                        self.format_song_details()
+                        with self.program_values.stage_timer.span("main_loop.format_song_details"):
+                            self.format_song_details()
 
                         # --- OctoPrint Code --- #
-                        self.octoPrint_logic()
+                        with self.program_values.stage_timer.span("main_loop.octoPrint_logic"):
+                            self.octoPrint_logic()
                         
                         # --- Update Display --- #
                         if (not self.program_values.HEADLESS):
-                            self.program_values.display.update_display_withSong(self.program_values.get_song_name(),
-                                                                                self.program_values.get_song_artist(),
-                                                                                self.program_values.get_explicit_song(),
-                                                                                self.program_values.octo_print_values.get_isPrinting(),
-                                                                                self.program_values.octo_print_values.get_progress()
-                                                                                )
+                            _, printer = self.program_values.octo_print_values.get_snapshot()
+                            # The display itself is timed on the display worker
+                            self.program_values.display_worker.submit("update_display_withSong",
+                                                                      self.program_values.get_song_name(),
+                                                                      self.program_values.get_song_artist(),
+                                                                      self.program_values.get_now_playing().explicit,
+                                                                      printer.isPrinting,
+                                                                      int(printer.get_progress()),
+                                                                      self.program_values.get_now_playing().album_id,
+                                                                      self.program_values.get_now_playing().album_art_url
+                                                                      )
 
                         # This resets the time since last refresh and should go after the display code
                         self.program_values.refresh_timer.reset_seconds_waited()
@@ -607,52 +906,66 @@ class ProgramLogic:
                         self.program_values.output.out(f"Displaying top artist: {self.program_values.get_top_artist_pointer() + 1}. {self.program_values.get_current_top_artist()}", "Main Loop")
                         
                         if (not self.program_values.HEADLESS):
-                            self.program_values.display.update_display_topArtist(self.program_values.get_top_artist_pointer() + 1,
-                                                                                self.program_values.get_current_top_artist(),
-                                                                                self.program_values.octo_print_values.get_isPrinting(),
-                                                                                self.program_values.octo_print_values.get_progress()
-                                                                                )
+                            _, printer = self.program_values.octo_print_values.get_snapshot()
+                            self.program_values.display_worker.submit("update_display_topArtist",
+                                                                      self.program_values.get_top_artist_pointer() + 1,
+                                                                      self.program_values.get_current_top_artist(),
+                                                                      printer.isPrinting,
+                                                                      int(printer.get_progress())
+                                                                      )
                         
                         # Increment the top_artist_pointer
                         if (self.program_values.get_top_artist_pointer() + 1 > (len(self.program_values.spotipy_values.get_top_artists()) - 1)):
-                            print("pointer reset")
+                            self.program_values.output.debug("Top artist pointer reset", "Main Loop")
                             self.program_values.set_top_artist_pointer(0)
                         else:
-                            print("pointer increment")
+                            self.program_values.output.debug("Top artist pointer incremented", "Main Loop")
                             self.program_values.set_top_artist_pointer(self.program_values.get_top_artist_pointer() + 1)
         
                         self.program_values.refresh_timer.reset_seconds_waited()
                     pass
 
-            time.sleep(1)
+            self.program_values.scheduler.schedule("refresh", self.get_next_refresh_delay(now_playing))
+
+    def get_next_refresh_delay(self, now_playing):
+        """
+        Works out when the main loop next needs to wake if nothing is published before then
+
+        Args:
+            now_playing (NowPlaying): The snapshot the last pass used
+
+        Returns:
+            float: Seconds until the next refresh is due
+        """
+        refresh_timer = self.program_values.refresh_timer
+        
+        if (now_playing.status == "stopped"):
+            # The next top artist
+            delay = refresh_timer.get_seconds_until(refresh_timer.get_max_wait() / 2)
+        elif (self.program_values.spotipy_values.get_version() != self.program_values.get_now_playing_version()):
+            # A new song that arrived before a refresh was allowed
+            delay = refresh_timer.get_seconds_until(refresh_timer.get_ready_wait())
+        else:
+            # The clock, if the refresh was held back near the end of the song only a new song or the next max wait will redraw
+            delay = refresh_timer.get_seconds_until(refresh_timer.get_max_wait()) or refresh_timer.get_max_wait()
+        
+        return max(delay, refresh_timer.get_seconds_until(refresh_timer.get_ready_wait()))
 
 try:
     if __name__ == "__main__":
         # Initialise Classes
         program_logic = ProgramLogic()
 
-        # Checks the connection to octoprint
-        max_retries = 0
-        while True:
-            if (max_retries < 5):
-                if (not program_logic.connection_check()):
-                    program_logic.program_values.output.out(f"Unable to connect to endpoint, retrying in 5s...", "connCheck")
-                    print()
-
-                    max_retries += 1
-
-                    time.sleep(5)
-                else:
-                    break
-            else:
-                raise TimeoutError("Unable to connect to endpoint and reached max retries")
+        # Checks the connections, loads the top artists and shows the splash screen
+        program_logic.startup()
 
-        # Makes an api call to get the top artists and passess the list of artists to spotipy_values
-        program_logic.program_values.spotipy_values.set_top_artists(program_logic.program_values.spotipy_api.get_top_artists())
-
-        # Clean the terminal and display SpotiPi text
+        # Clean the terminal and display SpotiPi text, once the start-up output has been written
+        program_logic.program_values.output.flush()
         os.system('cls' if os.name == 'nt' else 'clear')
         program_logic.program_values.output.startup(version=program_logic.program_values.VERSION)
+        
+        if (program_logic.program_values.STARTUP_TRACE):
+            program_logic.program_values.startup_trace.report(program_logic.program_values.output)
 
         # Start the threads
         program_logic.start_threads()
@@ -666,10 +979,39 @@ except KeyboardInterrupt:
 except Exception as Ex:
     print("Encountered a fatal error, shutting down program.")
     print(Ex)
+    
+    # Write out the records leading up to the error
+    try:
+        program_logic.program_values.output.dump(f"fatal error: {Ex}")
+        program_logic.program_values.output.flush()
+    except Exception:
+        pass
 
 
+# Write the stage timings and profile, program_logic isn't set if the start-up failed
+try:
+    if ("program_logic" in globals() and program_logic.program_values.PROFILE is not None):
+        program_logic.program_values.stage_timer.report(program_logic.program_values.output)
+        program_logic.program_values.stage_timer.write_profile(program_logic.program_values.PROFILE)
+        program_logic.program_values.output.flush()
+        print(f"Profile written to '{program_logic.program_values.PROFILE}'")
+except Exception as Ex:
+    print("Unable to write the profile!")
+    print(Ex)
+
 # Clean the display ones the program has finished running
 try:
+    if (getattr(program_logic, "metrics_server", None) is not None):
+        program_logic.metrics_server.stop()
+    
+    for push_client in program_logic.program_values.octo_print_push:
+        push_client.stop(timeout=5)
+    
+    # Drops any poll still waiting on an offline printer so it doesn't hold up the exit
+    program_logic.program_values.printer_registry.shutdown()
+    
+    # Let any refresh in progress finish before cleaning
+    program_logic.program_values.display_worker.stop(timeout=60)
     program_logic.program_values.display.clean_display(3)
 except Exception as Ex:
     print("Unable to clean the screen!")